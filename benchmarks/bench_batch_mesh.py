@@ -0,0 +1,237 @@
+"""
+Wall time of batchMakeUmesh against a stub cubit module and a stub
+mbconvert, so it runs on a machine without Cubit. The stub meshes every
+step file into the same two tets scaled by a number written in the step
+file, and sleeps to stand in for meshing time.
+
+Every run is also checked: each step file must come back with its own h5m
+holding its own geometry, no exodus files may be left in the scratch
+directory, and step files with the same basename must be rejected. A
+last batch through a mesh cache only big enough for one mesh checks that
+the cache hits it returns are still there afterwards. Exits with status 1
+if any check fails.
+
+    python benchmarks/bench_batch_mesh.py --num-steps 16 --workers 1 4
+"""
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STUB_CUBIT = """
+import re
+import time
+import h5py
+import numpy as np
+
+_scale = 1.0
+
+
+def init(args):
+    pass
+
+
+def cmd(command):
+    global _scale
+    step = re.match(r'import step "(.*)"', command)
+    if step is not None:
+        with open(step.group(1)) as f:
+            _scale = float(f.read())
+        time.sleep({delay})
+    export = re.match(r'export mesh "(.*)"', command)
+    if export is not None:
+        nodes = _scale * np.array(
+            [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]],
+            dtype=float,
+        )
+        with h5py.File(export.group(1), "w") as f:
+            coordinates = f.create_dataset(
+                "tstt/nodes/coordinates", data=nodes
+            )
+            coordinates.attrs["start_id"] = 1
+            f.create_dataset(
+                "tstt/elements/Tet4/connectivity",
+                data=np.array([[1, 2, 3, 4], [2, 3, 4, 5]]),
+            )
+"""
+
+# the stub exodus files are already h5m
+STUB_MBCONVERT = '#!/bin/sh\ncp "$1" "$2"\n'
+
+# total volume of the stub's two tets at scale 1
+UNIT_VOLUME = 0.5
+
+
+def write_stubs(directory, delay):
+    """Write cubit.py and mbconvert to directory, return mbconvert's path"""
+    with open(os.path.join(directory, "cubit.py"), "w") as f:
+        f.write(STUB_CUBIT.format(delay=delay))
+
+    mbconvert = os.path.join(directory, "mbconvert")
+    with open(mbconvert, "w") as f:
+        f.write(STUB_MBCONVERT)
+    os.chmod(mbconvert, os.stat(mbconvert).st_mode | stat.S_IEXEC)
+
+    return mbconvert
+
+
+def write_steps(directory, scales):
+    """One step file per scale, each with a different basename"""
+    paths = []
+    for i, scale in enumerate(scales):
+        path = os.path.join(directory, f"component_{i}.step")
+        with open(path, "w") as f:
+            f.write(repr(scale))
+        paths.append(path)
+    return paths
+
+
+def check_status(status, scales, scratch_dir):
+    """List of the problems with a batchMakeUmesh result"""
+    from edgars_little_helpers.h5m_mesh import mesh_statistics
+
+    problems = []
+    h5m_names = set()
+    for (step, entry), scale in zip(status.items(), scales):
+        if entry["error"] is not None:
+            problems.append(f"{step}: {entry['error']}")
+            continue
+        h5m_name = entry["h5m"]
+        if not os.path.isabs(h5m_name) or not os.path.exists(h5m_name):
+            problems.append(f"{step}: {h5m_name} is missing or relative")
+            continue
+        if h5m_name in h5m_names:
+            problems.append(f"{step}: {h5m_name} returned twice")
+        h5m_names.add(h5m_name)
+        volume = mesh_statistics(h5m_name)["total_volume"]
+        if abs(volume - UNIT_VOLUME * scale**3) > 1e-9 * scale**3:
+            problems.append(f"{step}: {h5m_name} holds another geometry")
+
+    left = os.listdir(scratch_dir)
+    if left:
+        problems.append(f"left in the scratch directory: {left}")
+
+    return problems
+
+
+def check_duplicates(makeUmesh, directory, mbconvert):
+    """Problems with how two step files with one basename are handled"""
+    paths = []
+    for subdirectory in ("a", "b"):
+        os.makedirs(os.path.join(directory, subdirectory))
+        path = os.path.join(directory, subdirectory, "fw.step")
+        with open(path, "w") as f:
+            f.write("1.0")
+        paths.append(path)
+
+    try:
+        makeUmesh.batchMakeUmesh(paths, workers=2, mbconvert=mbconvert)
+    except ValueError:
+        return []
+    return ["step files with the same basename were not rejected"]
+
+
+def check_cache(makeUmesh, directory, steps, scales, mbconvert):
+    """
+    Problems with a batch whose cache stores would evict its own cache
+    hits, if they weren't protected
+    """
+    work_dir = os.path.join(directory, "cached")
+    cache_dir = os.path.join(work_dir, "cache")
+    scratch_dir = os.path.join(work_dir, "scratch")
+    os.makedirs(scratch_dir)
+    os.chdir(work_dir)
+
+    makeUmesh.batchMakeUmesh(
+        steps[:1], mbconvert=mbconvert, cacheDir=cache_dir
+    )
+    max_bytes = sum(
+        os.path.getsize(os.path.join(cache_dir, name))
+        for name in os.listdir(cache_dir)
+    )
+    status = makeUmesh.batchMakeUmesh(
+        steps,
+        workers=2,
+        mbconvert=mbconvert,
+        cacheDir=os.path.relpath(cache_dir),
+        maxCacheBytes=max_bytes,
+        scratchDir=scratch_dir,
+    )
+    return check_status(status, scales, scratch_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--num-steps", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument(
+        "--delay", type=float, default=0.1, help="stub meshing time in s"
+    )
+    args = parser.parse_args()
+
+    problems = []
+    with tempfile.TemporaryDirectory() as directory:
+        stub_dir = os.path.join(directory, "stubs")
+        os.makedirs(stub_dir)
+        mbconvert = write_stubs(stub_dir, args.delay)
+        # spawned worker processes need to find the stub too
+        sys.path.insert(0, stub_dir)
+        os.environ["PYTHONPATH"] = os.pathsep.join(
+            [stub_dir, ROOT] + [p for p in [os.environ.get("PYTHONPATH")] if p]
+        )
+        from edgars_little_helpers import makeUmesh
+
+        step_dir = os.path.join(directory, "steps")
+        os.makedirs(step_dir)
+        scales = [1.0 + i for i in range(args.num_steps)]
+        steps = write_steps(step_dir, scales)
+
+        cwd = os.getcwd()
+        try:
+            for workers in args.workers:
+                work_dir = os.path.join(directory, f"work_{workers}")
+                scratch_dir = os.path.join(work_dir, "scratch")
+                os.makedirs(scratch_dir)
+                os.chdir(work_dir)
+
+                start = time.perf_counter()
+                status = makeUmesh.batchMakeUmesh(
+                    steps,
+                    workers=workers,
+                    mbconvert=mbconvert,
+                    scratchDir=scratch_dir,
+                )
+                seconds = time.perf_counter() - start
+                print(
+                    f"{workers:>3} workers: {seconds:8.3f} s, "
+                    f"{len(steps) / seconds:8.2f} step files per s"
+                )
+                problems += check_status(status, scales, scratch_dir)
+
+            problems += check_cache(
+                makeUmesh, directory, steps, scales, mbconvert
+            )
+
+            duplicate_dir = os.path.join(directory, "duplicates")
+            os.makedirs(duplicate_dir)
+            os.chdir(duplicate_dir)
+            problems += check_duplicates(makeUmesh, duplicate_dir, mbconvert)
+        finally:
+            os.chdir(cwd)
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Throughput of contour plotting in plots per second, drawing a figure per
+plot with plot_tri_contour against render_contours reusing one figure per
+worker.
+
+    python benchmarks/bench_contour.py --num-plots 100 --workers 1 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+from edgars_little_helpers import plotContour  # noqa: E402
+
+
+def make_solutions(num_plots, num_points, seed=0):
+    """Scattered x, y and a smooth peaked field on them for each plot"""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 360, num_points)
+    y = rng.uniform(0, 360, num_points)
+    solutions = [
+        (i + 1) * np.exp(-((x - 180) ** 2 + (y - 180) ** 2) / (2e3 * (i + 1)))
+        for i in range(num_plots)
+    ]
+    return x, y, solutions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-plots", type=int, default=100)
+    parser.add_argument("--num-points", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    x, y, solutions = make_solutions(args.num_plots, args.num_points)
+    titles = [f"plot {i}" for i in range(args.num_plots)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = [
+            os.path.join(directory, f"{i}.png") for i in range(args.num_plots)
+        ]
+
+        start = time.perf_counter()
+        for solution, title, filename in zip(solutions, titles, filenames):
+            plotContour.plot_tri_contour(
+                solution, x, y, "phi", "theta", "value", title, filename
+            )
+        rate = args.num_plots / (time.perf_counter() - start)
+        print(f"{'plot_tri_contour':>24}: {rate:8.2f} plots per second")
+
+        for workers in args.workers:
+            rate = plotContour.render_contours(
+                solutions,
+                x,
+                y,
+                "phi",
+                "theta",
+                "value",
+                titles,
+                filenames,
+                workers=workers,
+                limit_line=0.2,
+            )
+            name = f"render_contours x{workers}"
+            print(f"{name:>24}: {rate:8.2f} plots per second")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Import time of each helper module and start up time of the CLI, each
+measured in a fresh interpreter, against a budget in milliseconds.
+
+    python benchmarks/bench_import.py --budget 300
+    python benchmarks/bench_import.py --output import_times.json
+
+Modules whose dependencies aren't installed (cubit, openmc, pystell) are
+reported as unavailable rather than failing. Exits with status 1 if
+anything measured goes over its budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "edgars_little_helpers",
+    "edgars_little_helpers.instrumentation",
+    "edgars_little_helpers.vmec_surface",
+    "edgars_little_helpers.h5m_mesh",
+    "edgars_little_helpers.surface_lookup",
+    "edgars_little_helpers.vmec_cache",
+    "edgars_little_helpers.centroids_to_theta_phi",
+    "edgars_little_helpers.stream_theta_phi",
+    "edgars_little_helpers.radial_build",
+    "edgars_little_helpers.getMaterial",
+    "edgars_little_helpers.tallierizer",
+    "edgars_little_helpers.tallierizer_batch",
+    "edgars_little_helpers.makeUmesh",
+    "edgars_little_helpers.plotContour",
+    "edgars_little_helpers.plotRadialBuildStellarator",
+]
+
+# the CLI is meant to start in about as long as the interpreter itself
+CLI_BUDGET_MS = 100
+
+
+def time_command(code, repeats):
+    """
+    Best wall time in ms of running code in a fresh interpreter, None if it
+    fails to run.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=250,
+        help="milliseconds allowed to import any one module, on top of "
+        "starting the interpreter",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write the timings to a JSON file")
+    args = parser.parse_args()
+
+    interpreter = time_command("pass", args.repeats)
+    print(f"{'interpreter':>48}: {interpreter:8.1f} ms")
+
+    results = {"interpreter_ms": interpreter, "budget_ms": args.budget}
+    over = []
+
+    cli = time_command(
+        "import sys; sys.argv = ['little-helpers', '--help']\n"
+        "from edgars_little_helpers.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass",
+        args.repeats,
+    )
+    results["cli_help_ms"] = cli - interpreter
+    print(f"{'little-helpers --help':>48}: {cli - interpreter:8.1f} ms")
+    if cli - interpreter > CLI_BUDGET_MS:
+        over.append("little-helpers --help")
+
+    results["modules"] = {}
+    for module in MODULES:
+        elapsed = time_command(f"import {module}", args.repeats)
+        if elapsed is None:
+            results["modules"][module] = None
+            print(f"{module:>48}: unavailable")
+            continue
+        elapsed -= interpreter
+        results["modules"][module] = elapsed
+        flag = ""
+        if elapsed > args.budget:
+            over.append(module)
+            flag = "  over budget"
+        print(f"{module:>48}: {elapsed:8.1f} ms{flag}")
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+
+    if over:
+        print(f"over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Microbenchmark for the residual evaluated by centroids_to_theta_phi.
+
+Reports time per million centroids and the temporary memory allocated per
+evaluation, both for the one shot residual function and for a reused
+ResidualKernel writing into a preallocated output array.
+
+    python benchmarks/bench_residual.py --num-centroids 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+from edgars_little_helpers import centroids_to_theta_phi  # noqa: E402
+from edgars_little_helpers.vmec_surface import VMECSurface  # noqa: E402
+from synthetic_vmec import RotatingEllipseVMEC, make_centroids  # noqa: E402
+
+
+def measure(function, repeats):
+    """Return seconds per call and bytes of temporaries per call"""
+    function()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    seconds = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-centroids", type=int, default=1000000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    surface = VMECSurface(RotatingEllipseVMEC(), 1.08)
+    coords = make_centroids(surface, args.num_centroids)[0]
+    phi_coords = np.arctan2(coords[:, 1], coords[:, 0])
+    thetas = np.random.default_rng(1).uniform(0, 2 * np.pi, len(coords))
+
+    cases = {
+        "residual": lambda: centroids_to_theta_phi.residual(
+            thetas, phi_coords, coords, surface.wall_s, surface
+        )
+    }
+    if hasattr(centroids_to_theta_phi, "ResidualKernel"):
+        kernel = centroids_to_theta_phi.ResidualKernel(
+            surface, phi_coords, coords
+        )
+        out = np.empty(len(coords))
+        cases["ResidualKernel(out=)"] = lambda: kernel(thetas, out=out)
+
+    per_million = 1e6 / len(coords)
+    for name, function in cases.items():
+        seconds, peak = measure(function, args.repeats)
+        print(
+            f"{name:>22}: {seconds * per_million:8.3f} s per 1e6 centroids, "
+            f"{peak / len(coords):8.1f} temporary bytes per centroid"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark suite for the centroid to (theta, phi) mapping.
+
+Runs get_theta_guesses, residual, centroids_to_theta_phi (with and without
+warm starting) and multithread_centroids_to_theta_phi on a synthetic
+rotating ellipse equilibrium, so no vmec file or network access is needed.
+Results are printed and written as JSON so they can be compared between
+revisions.
+
+    python benchmarks/bench_theta_phi.py --sizes 1000 10000 100000 1000000 \
+        --workers 1 2 4 8 --output bench_theta_phi.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from edgars_little_helpers import centroids_to_theta_phi  # noqa: E402
+from edgars_little_helpers.vmec_surface import VMECSurface  # noqa: E402
+from synthetic_vmec import RotatingEllipseVMEC, make_centroids  # noqa: E402
+
+
+def _git_revision():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=REPO_DIR,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(function, trace_memory=True):
+    """
+    Run function once to time it and, if trace_memory, once more under
+    tracemalloc for the peak of memory allocated in this process.
+
+    Returns:
+        result: what function returned on the timed run
+        seconds (float)
+        peak_bytes (int or None)
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+
+    peak_bytes = None
+    if trace_memory:
+        tracemalloc.start()
+        function()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result, seconds, peak_bytes
+
+
+def record(name, num_centroids, seconds, peak_bytes, workers=1, **extra):
+    entry = {
+        "benchmark": name,
+        "num_centroids": num_centroids,
+        "workers": workers,
+        "seconds": seconds,
+        "centroids_per_second": num_centroids / seconds,
+        "peak_bytes": peak_bytes,
+    }
+    entry.update(extra)
+
+    peak = "-" if peak_bytes is None else f"{peak_bytes / 2**20:.1f} MiB"
+    print(
+        f"{name:>34} n={num_centroids:<8d} workers={workers:<3d} "
+        f"{seconds:9.3f} s {entry['centroids_per_second']:12.0f} /s "
+        f"peak {peak}"
+    )
+
+    return entry
+
+
+def iteration_stats(iterations, converged):
+    return {
+        "iteration_histogram": np.bincount(iterations).tolist(),
+        "mean_iterations": float(np.mean(iterations)),
+        "max_iterations": int(np.max(iterations)),
+        "failed": int(np.count_nonzero(~converged)),
+    }
+
+
+def run(sizes, workers, num_theta_guesses, max_iter, wall_s, trace_memory):
+    surface = VMECSurface(RotatingEllipseVMEC(), wall_s)
+    results = []
+
+    for num_centroids in sizes:
+        centroids = make_centroids(surface, num_centroids)[0]
+        phi_coords = np.arctan2(centroids[:, 1], centroids[:, 0])
+
+        thetas, seconds, peak = timed(
+            lambda: centroids_to_theta_phi.get_theta_guesses(
+                num_theta_guesses, phi_coords, centroids, wall_s, surface
+            ),
+            trace_memory,
+        )
+        results.append(
+            record(
+                "get_theta_guesses",
+                num_centroids,
+                seconds,
+                peak,
+                num_theta_guesses=num_theta_guesses,
+            )
+        )
+
+        _, seconds, peak = timed(
+            lambda: centroids_to_theta_phi.residual(
+                thetas, phi_coords, centroids, wall_s, surface
+            ),
+            trace_memory,
+        )
+        results.append(record("residual", num_centroids, seconds, peak))
+
+        for warm_start in (False, True):
+            output, seconds, peak = timed(
+                lambda: centroids_to_theta_phi.centroids_to_theta_phi(
+                    centroids,
+                    wall_s,
+                    surface,
+                    num_theta_guesses,
+                    max_iter,
+                    full_output=True,
+                    warm_start=warm_start,
+                ),
+                trace_memory,
+            )
+            name = "centroids_to_theta_phi"
+            if warm_start:
+                name += "(warm_start)"
+            results.append(
+                record(
+                    name,
+                    num_centroids,
+                    seconds,
+                    peak,
+                    **iteration_stats(output[2], output[3]),
+                )
+            )
+
+        for num_workers in workers:
+            # worker memory isn't visible to tracemalloc in this process
+            output, seconds, _ = timed(
+                lambda: centroids_to_theta_phi.multithread_centroids_to_theta_phi(
+                    centroids,
+                    wall_s,
+                    surface,
+                    num_theta_guesses,
+                    max_iter,
+                    num_threads=num_workers,
+                    full_output=True,
+                ),
+                trace_memory=False,
+            )
+            results.append(
+                record(
+                    "multithread_centroids_to_theta_phi",
+                    num_centroids,
+                    seconds,
+                    None,
+                    workers=num_workers,
+                    **iteration_stats(output[2], output[3]),
+                )
+            )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000, 1000000],
+        help="centroid counts to benchmark",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="worker counts for multithread_centroids_to_theta_phi",
+    )
+    parser.add_argument("--num-theta-guesses", type=int, default=360)
+    parser.add_argument("--max-iter", type=int, default=100)
+    parser.add_argument("--wall-s", type=float, default=1.08)
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="skip the extra tracemalloc run of each serial benchmark",
+    )
+    parser.add_argument(
+        "--output", default=None, help="path to write JSON results to"
+    )
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        results = run(
+            args.sizes,
+            args.workers,
+            args.num_theta_guesses,
+            args.max_iter,
+            args.wall_s,
+            not args.no_memory,
+        )
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {
+            "num_theta_guesses": args.num_theta_guesses,
+            "max_iter": args.max_iter,
+            "wall_s": args.wall_s,
+        },
+        "results": results,
+    }
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
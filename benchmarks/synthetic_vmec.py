@@ -0,0 +1,87 @@
+"""
+Analytic stand-in for read_vmec.VMECData so the benchmarks run without a
+vmec file.
+"""
+import numpy as np
+
+
+class RotatingEllipseVMEC(object):
+    """
+    Rotating ellipse torus with the parts of the read_vmec.VMECData interface
+    the helpers use. Lengths are in m, like VMECData, and the minor radius
+    grows with sqrt(s) so wall_s > 1 extrapolates past the plasma edge.
+
+    Arguments:
+        major_radius (float): R of the magnetic axis in m
+        minor_radius (float): mean minor radius at s=1 in m
+        elongation (float): ratio of the ellipse axes
+        nfp (int): number of field periods the ellipse rotates over
+    """
+
+    def __init__(
+        self, major_radius=10.0, minor_radius=1.5, elongation=1.5, nfp=4
+    ):
+        self.nfp = nfp
+        self.xm = np.array([0, 1, 1])
+        self.xn = np.array([0, 0, nfp])
+
+        # R = R0 + a cos(theta) + b cos(theta - nfp phi)
+        # Z = a sin(theta) - b sin(theta - nfp phi)
+        # an ellipse with semi-axes a + b and a - b in each phi plane, whose
+        # axes rotate as phi goes around a field period
+        self.major_radius = major_radius
+        self.mean_minor = minor_radius * (1 + elongation) / 2
+        self.rotating_minor = minor_radius * (elongation - 1) / 2
+
+    def _coefficients(self, s):
+        scale = np.sqrt(s)
+        rmnc = np.array(
+            [
+                self.major_radius,
+                self.mean_minor * scale,
+                self.rotating_minor * scale,
+            ]
+        )
+        zmns = np.array(
+            [0, self.mean_minor * scale, -self.rotating_minor * scale]
+        )
+        return rmnc, zmns
+
+    def vmec2xyz(self, s, theta, phi):
+        rmnc, zmns = self._coefficients(s)
+        angles = self.xm * theta - self.xn * phi
+        r = np.sum(rmnc * np.cos(angles))
+        z = np.sum(zmns * np.sin(angles))
+
+        return r * np.cos(phi), r * np.sin(phi), z
+
+
+def make_centroids(surface, num_centroids, max_depth=50, seed=0):
+    """
+    Random points between the surface and max_depth cm outside of it along
+    the normal in their phi plane, shaped like the centroids of a blanket
+    mesh.
+
+    Arguments:
+        surface (VMECSurface): surface to offset from
+        num_centroids (int): number of points
+        max_depth (float): largest offset from the surface, cm
+        seed (int): random seed
+
+    Returns:
+        centroids (np array of x,y,z)
+        thetas (1D np array): theta each point was generated from, radians
+    """
+    rng = np.random.default_rng(seed)
+    thetas = rng.uniform(0, 2 * np.pi, num_centroids)
+    phis = rng.uniform(-np.pi, np.pi, num_centroids)
+    depths = rng.uniform(0, max_depth, num_centroids)
+
+    r, z = surface.rz_derivatives(thetas, phis, 1)
+    norms = np.hypot(r[1], z[1])
+    rs = r[0] + depths * z[1] / norms
+    zs = z[0] - depths * r[1] / norms
+
+    centroids = np.stack((rs * np.cos(phis), rs * np.sin(phis), zs), axis=1)
+
+    return centroids, thetas
@@ -0,0 +1,50 @@
+"""
+Meshing, surface mapping and tally post-processing helpers.
+
+Attributes of this package are its modules, each imported the first time
+it is used, so
+
+    import edgars_little_helpers as helpers
+    helpers.tallierizer.calcHeating(...)
+
+only pays for tallierizer's dependencies, and nothing is imported by
+importing the package itself. Within the modules the same goes for slow or
+optional dependencies (matplotlib, scipy, openmc, pystell, cubit, pymoab),
+which are imported inside the functions that need them rather than at the
+top of the module.
+
+Worker processes forked for the batch functions start with a copy of the
+parent's instrumentation records, so their initializers reset them before
+recording their own work to send back.
+"""
+import importlib
+
+__all__ = [
+    "centroids_to_theta_phi",
+    "getMaterial",
+    "h5m_mesh",
+    "instrumentation",
+    "makeUmesh",
+    "plotContour",
+    "plotRadialBuildStellarator",
+    "plotxy",
+    "radial_build",
+    "stream_theta_phi",
+    "surface_lookup",
+    "tallierizer",
+    "tallierizer_batch",
+    "vmec_cache",
+    "vmec_surface",
+]
+
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{name}")
+    globals()[name] = module
+    return module
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
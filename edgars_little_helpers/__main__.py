@@ -0,0 +1,4 @@
+from edgars_little_helpers.cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,896 @@
+import numpy as np
+import concurrent.futures
+from multiprocessing import shared_memory
+import warnings
+from . import instrumentation
+from .vmec_surface import VMECSurface, as_surface
+from . import vmec_cache
+from .surface_lookup import SurfaceLookupTable
+
+
+def magnitude(vec_list):
+    """return the magnitudes of a list of vectors
+
+    Arguments:
+        vec_list (NX3 np array)
+
+    Returns:
+        magnitude_list (NX1 np_array)
+    """
+    magnitude_list = (
+        vec_list[:, 0] ** 2 + vec_list[:, 1] ** 2 + vec_list[:, 2] ** 2
+    )
+    magnitude_list = np.sqrt(magnitude_list)
+
+    return magnitude_list
+
+
+def dot(vec1, vec2):
+    """Returns a list of the dot products of 2 lists of vectors
+
+    Arguments:
+        vec1 (NX3 np array)
+        vec2 (NX3 np array)
+
+    returns:
+        dot_list (NX1 np array)
+    """
+    dot_list = (
+        vec1[:, 0] * vec2[:, 0]
+        + vec1[:, 1] * vec2[:, 1]
+        + vec1[:, 2] * vec2[:, 2]
+    )
+
+    return dot_list
+
+
+def cross(vec1, vec2):
+    """Returns a list of the cross products of 2 lists of vectors
+
+    Arguments:
+        vec1 (NX3 np array)
+        vec2 (NX3 np array)
+
+    returns:
+        cross_list (NX3 np array)
+    """
+
+    i_list = vec1[:, 1] * vec2[:, 2] - vec1[:, 2] * vec2[:, 1]
+    j_list = vec1[:, 2] * vec2[:, 0] - vec1[:, 0] * vec2[:, 2]
+    k_list = vec1[:, 0] * vec2[:, 1] - vec1[:, 1] * vec2[:, 0]
+
+    cross_list = np.array([i_list, j_list, k_list]).T
+
+    return cross_list
+
+
+def get_theta_guesses(
+    num_theta_guesses, phi_coords, coords, wall_s, vmec, chunk_size=10000
+):
+    """
+    Calculate the distances between the plasma surface and the coordinate at
+    each theta, phi combination and keep the theta that gets the smallest
+    distance as an initial guess
+
+    The surface is evaluated for a whole chunk of centroids at every theta
+    at once, chunk_size bounds the size of the chunk X theta arrays.
+
+    this might be better as a minimization routine
+    """
+    surface = as_surface(vmec, wall_s)
+    theta_grid = np.linspace(0, 2 * np.pi, num_theta_guesses)
+
+    theta_guesses = np.empty(len(coords))
+    for start in range(0, len(coords), chunk_size):
+        phis = phi_coords[start : start + chunk_size]
+        chunk = coords[start : start + chunk_size]
+
+        r, z = surface.rz_grid(theta_grid, phis)
+        x = r * np.cos(phis)[:, np.newaxis]
+        y = r * np.sin(phis)[:, np.newaxis]
+
+        distances = (
+            np.square(chunk[:, 0, np.newaxis] - x)
+            + np.square(chunk[:, 1, np.newaxis] - y)
+            + np.square(chunk[:, 2, np.newaxis] - z)
+        )
+        theta_guesses[start : start + chunk_size] = theta_grid[
+            np.argmin(distances, axis=1)
+        ]
+
+    return theta_guesses
+
+
+class ResidualKernel(object):
+    """
+    Fused evaluation of residual for a fixed set of centroids.
+
+    Everything that depends only on the centroids, the phi angles and the
+    surface is computed once, and every buffer an evaluation needs is
+    allocated up front, so calling the kernel repeatedly with new thetas
+    (as a root finder does) allocates nothing if out is supplied. R, Z and
+    their theta derivatives come from VMECSurface.rz_derivatives writing
+    into those buffers, chunk_size centroids at a time, so the centroids X
+    modes buffers stay a fixed size however many centroids there are.
+
+    The residual is evaluated in the phi plane of each centroid. With o the
+    offset from the surface point to the centroid and n the unit normal
+    formed from the tangent and the phi plane normal, the distance from the
+    centroid to the normal line is sqrt(|o|^2 - (o.n)^2) and the centroid is
+    below the tangent plane when o.n < 0.
+
+    Arguments:
+        surface (VMECSurface): surface to offset from
+        phi_coords (1D numpy array): phi coordinate of each centroid
+        coords (numpy array of XYZ): centroids
+        chunk_size (int): centroids per Fourier series evaluation, defaults
+            to surface.chunk_size
+    """
+
+    def __init__(self, surface, phi_coords, coords, chunk_size=None):
+        num_points = len(phi_coords)
+
+        self.surface = surface
+        self.surface_work = surface.workspace(num_points, chunk_size)
+        self.phi_coords = np.ascontiguousarray(phi_coords, dtype=float)
+
+        cos_phi = np.cos(phi_coords)
+        sin_phi = np.sin(phi_coords)
+        self.rho_coords = coords[:, 0] * cos_phi + coords[:, 1] * sin_phi
+        self.z_coords = np.ascontiguousarray(coords[:, 2])
+        self.out_of_plane_sq = np.square(
+            coords[:, 1] * cos_phi - coords[:, 0] * sin_phi
+        )
+
+        # R, dR/dtheta and Z, dZ/dtheta
+        self.r = np.empty((2, num_points))
+        self.z = np.empty((2, num_points))
+        self.offset_r = np.empty(num_points)
+        self.offset_z = np.empty(num_points)
+        self.normal_offset = np.empty(num_points)
+        self.work = np.empty(num_points)
+
+    def __call__(self, theta_guesses, out=None):
+        """
+        Arguments:
+            theta_guesses (1D numpy array): guessed theta coordinates in
+                radians
+            out (1D numpy array): optional array to write the residuals to
+
+        Returns:
+            distances (1D numpy array): as for residual
+        """
+        if out is None:
+            out = np.empty(len(theta_guesses))
+
+        self.surface.rz_derivatives(
+            theta_guesses,
+            self.phi_coords,
+            1,
+            out=(self.r, self.z),
+            work=self.surface_work,
+        )
+        r, dr = self.r
+        z, dz = self.z
+
+        np.subtract(self.rho_coords, r, out=self.offset_r)
+        np.subtract(self.z_coords, z, out=self.offset_z)
+
+        # o.n, normal = (dZ/dtheta, -dR/dtheta) in the (R, Z) plane
+        np.multiply(self.offset_r, dz, out=self.normal_offset)
+        np.multiply(self.offset_z, dr, out=self.work)
+        np.subtract(self.normal_offset, self.work, out=self.normal_offset)
+        np.multiply(dz, dz, out=self.work)
+        np.multiply(dr, dr, out=out)
+        np.add(self.work, out, out=self.work)
+        np.sqrt(self.work, out=self.work)
+        np.divide(self.normal_offset, self.work, out=self.normal_offset)
+
+        # distance from the centroid to the normal line
+        np.multiply(self.offset_r, self.offset_r, out=out)
+        np.multiply(self.offset_z, self.offset_z, out=self.work)
+        np.add(out, self.work, out=out)
+        np.add(out, self.out_of_plane_sq, out=out)
+        np.multiply(self.normal_offset, self.normal_offset, out=self.work)
+        np.subtract(out, self.work, out=out)
+        np.maximum(out, 0, out=out)
+        np.sqrt(out, out=out)
+
+        # plus the distance below the tangent plane, if it is below
+        np.negative(self.normal_offset, out=self.work)
+        np.maximum(self.work, 0, out=self.work)
+        np.add(out, self.work, out=out)
+
+        return out
+
+
+def residual(theta_guesses, phi_coords, coords, wall_s, vmec):
+    """
+    compute normal at theta_guesses, calculate how close each normal comes to
+    each centroid, return that value for each theta guess as the residual
+
+    each phi has a corresponding plane. The tangent vector and normal vector
+    will lie in this plane. The tangent is the analytic theta derivative of
+    the surface, see ResidualKernel for repeated evaluation on the same
+    centroids without reallocating.
+
+    Arguments:
+        theta_guess (1D numpy array): guessed theta coordinates in radians
+        phi_coords (1D numpy array): phi coordinate corresponding to theta
+        guesses coords (numpy array of XYZ): centroid of mesh element for
+            which to findtheta, phi
+        wall_s (float): wall_s vmec parameter for the surface to offset from
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+            information
+
+    returns:
+        distances (1D numpy array): perpendicular distance each calculated
+            poloidal vector is from the corresponding centroid. If the centroid
+            is found to be below the plane formed by the tangent and toroidal
+            normal then its distance from that plane is added, to
+            encourage the correct one of the two roots to be found.
+    """
+    surface = as_surface(vmec, wall_s)
+
+    return ResidualKernel(surface, phi_coords, coords)(
+        np.asarray(theta_guesses, dtype=float)
+    )
+
+
+def solve_thetas(
+    theta_guesses,
+    phi_coords,
+    coords,
+    wall_s,
+    vmec,
+    max_iter,
+    tol=1e-10,
+    max_step=0.5,
+):
+    """
+    Elementwise Halley iteration for the theta at which the surface normal
+    in each phi plane passes through the corresponding centroid.
+
+    Each element is solved for the root of (coord - P(theta)) . dP/dtheta,
+    which vanishes when the offset from the surface point P is perpendicular
+    to the tangent. All theta derivatives of P are evaluated analytically
+    from the fourier series. Elements are dropped from the active set as
+    soon as they converge, so elements that converge quickly cost nothing
+    while the slow ones finish.
+
+    Arguments:
+        theta_guesses (1D numpy array): initial theta coordinates in radians
+        phi_coords (1D numpy array): phi coordinate corresponding to theta
+            guesses
+        coords (numpy array of XYZ): centroid of mesh element for which to
+            find theta
+        wall_s (float): wall_s vmec parameter for the surface to offset from
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+            information
+        max_iter (int): maximum iterations for any single element
+        tol (float): converged once the theta update is smaller than this
+        max_step (float): largest theta update allowed in one iteration, in
+            radians
+
+    returns:
+        thetas (1D numpy array): theta coordinates in radians
+        iterations (1D numpy array): iterations used by each element
+        converged (1D numpy array of bool): False where an element ran out
+            of iterations or converged on the wrong side of the surface
+    """
+    surface = as_surface(vmec, wall_s)
+
+    thetas = np.array(theta_guesses, dtype=float)
+    iterations = np.zeros(len(thetas), dtype=int)
+    converged = np.zeros(len(thetas), dtype=bool)
+
+    # R, Z and their first three theta derivatives for the active elements,
+    # allocated once and written into by every iteration
+    r_buffer = np.empty((4, len(thetas)))
+    z_buffer = np.empty((4, len(thetas)))
+    surface_work = surface.workspace(len(thetas))
+
+    # in plane distance from the axis and height of each centroid
+    rho_coords = coords[:, 0] * np.cos(phi_coords) + coords[:, 1] * np.sin(
+        phi_coords
+    )
+    z_coords = coords[:, 2]
+
+    active = np.arange(len(thetas))
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+
+        r = r_buffer[:, : len(active)]
+        z = z_buffer[:, : len(active)]
+        surface.rz_derivatives(
+            thetas[active],
+            phi_coords[active],
+            3,
+            out=(r, z),
+            work=surface_work,
+        )
+        delta_r = rho_coords[active] - r[0]
+        delta_z = z_coords[active] - z[0]
+
+        f = delta_r * r[1] + delta_z * z[1]
+        df = -(r[1] ** 2 + z[1] ** 2) + delta_r * r[2] + delta_z * z[2]
+        ddf = (
+            -3 * (r[1] * r[2] + z[1] * z[2]) + delta_r * r[3] + delta_z * z[3]
+        )
+
+        steps = -2 * f * df / (2 * df**2 - f * ddf)
+        steps = np.clip(np.nan_to_num(steps), -max_step, max_step)
+
+        thetas[active] += steps
+        iterations[active] += 1
+        instrumentation.count("theta_phi.newton_steps", len(active))
+
+        done = np.abs(steps) < tol
+        converged[active[done]] = True
+        active = active[~done]
+
+    # the normal at the root must point from the surface toward the centroid,
+    # otherwise the root found is the one on the far side of the surface
+    r, z = surface.rz_derivatives(
+        thetas,
+        phi_coords,
+        1,
+        out=(r_buffer[:2], z_buffer[:2]),
+        work=surface_work,
+    )
+    orientations = r[1] * (z_coords - z[0]) - z[1] * (rho_coords - r[0])
+    converged &= orientations <= 0
+
+    return thetas, iterations, converged
+
+
+def _spread_bits(values):
+    """
+    Spread the low 21 bits of each value so there are two zero bits between
+    each of them, for interleaving three coordinates into a morton code.
+    """
+    values = values.astype(np.uint64) & np.uint64(0x1FFFFF)
+    values = (values | values << np.uint64(32)) & np.uint64(0x1F00000000FFFF)
+    values = (values | values << np.uint64(16)) & np.uint64(0x1F0000FF0000FF)
+    values = (values | values << np.uint64(8)) & np.uint64(0x100F00F00F00F00F)
+    values = (values | values << np.uint64(4)) & np.uint64(0x10C30C30C30C30C3)
+    values = (values | values << np.uint64(2)) & np.uint64(0x1249249249249249)
+
+    return values
+
+
+def morton_order(coords, bits=21):
+    """
+    Return the order that sorts coords along a morton (z-order) curve, which
+    keeps points that are close in space close in the ordering.
+
+    Arguments:
+        coords (numpy array of XYZ): points to order
+        bits (int): bits per axis the bounding box is quantized to, at most
+            21
+
+    Returns:
+        order (1D np array of int): indices that sort coords along the curve
+    """
+    if len(coords) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    lower = coords.min(axis=0)
+    extent = np.maximum(coords.max(axis=0) - lower, np.finfo(float).tiny)
+    quantized = ((coords - lower) / extent * (2**bits - 1)).astype(np.uint64)
+
+    codes = (
+        _spread_bits(quantized[:, 0])
+        | _spread_bits(quantized[:, 1]) << np.uint64(1)
+        | _spread_bits(quantized[:, 2]) << np.uint64(2)
+    )
+
+    return np.argsort(codes, kind="stable")
+
+
+def _initial_guesses(
+    num_theta_guesses, phi_coords, coords, wall_s, surface, guess_table
+):
+    if guess_table is not None:
+        if guess_table.wall_s != wall_s:
+            raise ValueError(
+                f"guess_table was built for wall_s={guess_table.wall_s}, "
+                f"not {wall_s}"
+            )
+        return guess_table.query(coords)[0]
+
+    return get_theta_guesses(
+        num_theta_guesses, phi_coords, coords, wall_s, surface
+    )
+
+
+def warm_start_thetas(
+    phi_coords,
+    coords,
+    wall_s,
+    vmec,
+    num_theta_guesses,
+    max_iter,
+    seed_stride=64,
+    guess_table=None,
+):
+    """
+    Solve for theta by continuation from neighbouring elements instead of
+    scanning for an initial guess for every element.
+
+    The elements are put in morton order and every seed_stride-th one is
+    solved from a full scan (or guess_table). Every other element is then
+    started from the converged theta of whichever adjacent seed in the
+    ordering is closer to it in space. Only elements that fail from the
+    neighbour's theta fall back to a full scan of their own.
+
+    Arguments:
+        phi_coords (1D numpy array): phi coordinate of each element
+        coords (numpy array of XYZ): centroid of each mesh element
+        wall_s (float): wall_s vmec parameter for the surface to offset from
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+            information
+        num_theta_guesses (int): number of evenly spaced theta points to
+            check for the seeds and fallbacks
+        max_iter (int): maximum iterations for any single solve
+        seed_stride (int): number of elements in the ordering per seed
+        guess_table (SurfaceLookupTable): optional source of initial guesses
+            for the seeds and fallbacks
+
+    returns:
+        thetas, iterations, converged: as for solve_thetas
+    """
+    surface = as_surface(vmec, wall_s)
+
+    num_elements = len(coords)
+    thetas = np.empty(num_elements)
+    iterations = np.zeros(num_elements, dtype=int)
+    converged = np.zeros(num_elements, dtype=bool)
+    if num_elements == 0:
+        return thetas, iterations, converged
+
+    order = morton_order(coords)
+    positions = np.arange(num_elements)
+    is_seed = positions % seed_stride == 0
+
+    # solve the seeds from scratch
+    seeds = order[is_seed]
+    thetas[seeds], iterations[seeds], converged[seeds] = solve_thetas(
+        _initial_guesses(
+            num_theta_guesses,
+            phi_coords[seeds],
+            coords[seeds],
+            wall_s,
+            surface,
+            guess_table,
+        ),
+        phi_coords[seeds],
+        coords[seeds],
+        wall_s,
+        surface,
+        max_iter,
+    )
+
+    # start everything else from the closer of its two adjacent seeds
+    followers = order[~is_seed]
+    follower_positions = positions[~is_seed]
+    before = order[follower_positions // seed_stride * seed_stride]
+    after = order[
+        np.minimum(
+            (follower_positions // seed_stride + 1) * seed_stride,
+            (num_elements - 1) // seed_stride * seed_stride,
+        )
+    ]
+    before_distances = np.where(
+        converged[before],
+        magnitude(coords[followers] - coords[before]),
+        np.inf,
+    )
+    after_distances = np.where(
+        converged[after],
+        magnitude(coords[followers] - coords[after]),
+        np.inf,
+    )
+    neighbours = np.where(before_distances <= after_distances, before, after)
+
+    (
+        thetas[followers],
+        iterations[followers],
+        converged[followers],
+    ) = solve_thetas(
+        thetas[neighbours],
+        phi_coords[followers],
+        coords[followers],
+        wall_s,
+        surface,
+        max_iter,
+    )
+
+    # fall back to a full scan where continuation didn't work out
+    retry = followers[~converged[followers]]
+    if len(retry) > 0:
+        retry_thetas, retry_iterations, converged[retry] = solve_thetas(
+            _initial_guesses(
+                num_theta_guesses,
+                phi_coords[retry],
+                coords[retry],
+                wall_s,
+                surface,
+                guess_table,
+            ),
+            phi_coords[retry],
+            coords[retry],
+            wall_s,
+            surface,
+            max_iter,
+        )
+        thetas[retry] = retry_thetas
+        iterations[retry] += retry_iterations
+
+    return thetas, iterations, converged
+
+
+def unwind_thetas(thetas):
+    new_thetas = thetas % (2 * np.pi)
+    new_thetas = np.where(thetas < 0, new_thetas, new_thetas)
+    return np.rad2deg(new_thetas)
+
+
+def centroids_to_theta_phi(
+    centroids,
+    wall_s,
+    vmec,
+    num_theta_guesses,
+    max_iter,
+    full_output=False,
+    guess_table=None,
+    warm_start=False,
+):
+    """
+    get the phi, theta coordinate pairs that, when offseting in the poloidal
+    normal from the surface described by wall_s, results in the normal
+    passing through the centroid.
+
+    if this is failing to converge, hopefully just increasing max_iter will
+    help. Each element is iterated independently (see solve_thetas), so
+    max_iter only costs time for the elements that actually need it.
+    Elements that fail are reported with a warning rather than failing the
+    whole batch.
+
+    Arguments:
+        centroids (np array of x,y,z): points at which to perform the above
+            root finding
+        wall_s (float): vmec parameter for the surface of interest
+        vmec (read_vmec object or VMECSurface): representation of plasma
+            equilibrium
+        num_theta_guesses (int): number of evenly spaced theta points to check
+            to determine the starting point for rootfinding
+        max_iter (int): maximum iterations before declaring that the root
+            has failed to converge.
+        full_output (bool): if True also return the per element iteration
+            counts and convergence flags
+        guess_table (SurfaceLookupTable): precomputed surface samples for
+            the same equilibrium and wall_s. If given, initial guesses come
+            from its KD-tree and num_theta_guesses is ignored.
+        warm_start (bool): if True seed most elements from an already solved
+            neighbour rather than an initial guess of their own, see
+            warm_start_thetas
+
+    Returns:
+        phi_coords (1D np array): phi of each centroid in degrees
+        theta_coords (1D np array): theta of each centroid in degrees
+        iterations (1D np array): only if full_output, iterations used by
+            each element
+        converged (1D np array of bool): only if full_output, False for
+            elements that failed to converge
+    """
+    # evaluate the surface from its fourier coefficients from here on
+    surface = as_surface(vmec, wall_s)
+
+    # calculate phi angles for each centroid
+    phi_coords = np.arctan2(centroids[:, 1], centroids[:, 0])
+
+    with instrumentation.timer("theta_phi.solve"):
+        if warm_start:
+            theta_coords, iterations, converged = warm_start_thetas(
+                phi_coords,
+                centroids,
+                wall_s,
+                surface,
+                num_theta_guesses,
+                max_iter,
+                guess_table=guess_table,
+            )
+        else:
+            theta_guesses = _initial_guesses(
+                num_theta_guesses,
+                phi_coords,
+                centroids,
+                wall_s,
+                surface,
+                guess_table,
+            )
+            theta_coords, iterations, converged = solve_thetas(
+                theta_guesses, phi_coords, centroids, wall_s, surface, max_iter
+            )
+    instrumentation.count("theta_phi.centroids", len(centroids))
+    instrumentation.count("theta_phi.failed", np.count_nonzero(~converged))
+    # retried warm start elements add up the iterations of both solves, so
+    # the last bin counts everything over max_iter and no element is lost
+    instrumentation.histogram(
+        "theta_phi.iterations",
+        np.minimum(iterations, max_iter + 1),
+        np.arange(max_iter + 3),
+    )
+
+    if not np.all(converged):
+        warnings.warn(
+            f"{np.count_nonzero(~converged)} of {len(converged)} elements "
+            f"failed to converge after {max_iter} iterations",
+            RuntimeWarning,
+        )
+
+    theta_coords = unwind_thetas(theta_coords)
+
+    if full_output:
+        return np.rad2deg(phi_coords), theta_coords, iterations, converged
+
+    return np.rad2deg(phi_coords), theta_coords
+
+
+def theta_phi_to_xyz(phi_coords, theta_coords, offsets, wall_s, vmec):
+    """
+    Inverse of centroids_to_theta_phi: offset from the surface at wall_s
+    along the same normal residual uses, for whole arrays of points at once.
+
+    Useful for placing tally points, source points or radial build layer
+    surfaces at a given phi, theta and depth.
+
+    Arguments:
+        phi_coords (np array): phi of each point in degrees
+        theta_coords (np array): theta of each point in degrees, broadcastable
+            against phi_coords
+        offsets (np array): distance along the normal from the surface in
+            cm, broadcastable against the angles. Negative values are inside
+            the surface.
+        wall_s (float): vmec parameter for the surface to offset from
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+
+    Returns:
+        points (np array of x,y,z): offset points, broadcast shape + (3,)
+        normals (np array of x,y,z): unit surface normals the points were
+            offset along, same shape
+    """
+    surface = as_surface(vmec, wall_s)
+    phi_coords, theta_coords, offsets = np.broadcast_arrays(
+        np.asarray(phi_coords, dtype=float),
+        np.asarray(theta_coords, dtype=float),
+        np.asarray(offsets, dtype=float),
+    )
+
+    points, normals = surface.points_and_normals(
+        np.deg2rad(theta_coords), np.deg2rad(phi_coords)
+    )
+    points += offsets[..., np.newaxis] * normals
+
+    return points, normals
+
+
+def normal_offsets(centroids, phi_coords, theta_coords, wall_s, vmec):
+    """
+    Signed distance of each centroid from the surface at wall_s along the
+    normal it lies on, the offsets theta_phi_to_xyz would need to give the
+    centroids back.
+
+    Arguments:
+        centroids (np array of x,y,z): mesh element centroids
+        phi_coords (1D np array): phi of each centroid in degrees, as from
+            centroids_to_theta_phi
+        theta_coords (1D np array): theta of each centroid in degrees
+        wall_s (float): vmec parameter for the surface to offset from
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+
+    Returns:
+        offsets (1D np array): distance in cm, negative inside the surface
+    """
+    points, normals = theta_phi_to_xyz(
+        phi_coords, theta_coords, 0, wall_s, vmec
+    )
+    points -= centroids
+    return -np.einsum("ij,ij->i", points, normals)
+
+
+# per worker process state for multithread_centroids_to_theta_phi, filled in
+# once by _init_shared_worker so each chunk only has to send its bounds
+_worker_state = {}
+
+
+def _attach_shared_array(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_shared_worker(
+    surface,
+    guess_table_path,
+    num_theta_guesses,
+    max_iter,
+    array_specs,
+    instrument,
+    trace,
+):
+    instrumentation.reset()
+    if instrument:
+        instrumentation.enable(trace)
+    else:
+        instrumentation.disable()
+    _worker_state["surface"] = surface
+    _worker_state["guess_table"] = (
+        SurfaceLookupTable.load(guess_table_path)
+        if guess_table_path is not None
+        else None
+    )
+    _worker_state["num_theta_guesses"] = num_theta_guesses
+    _worker_state["max_iter"] = max_iter
+    # keep the SharedMemory handles alive as long as the views into them
+    _worker_state["shms"] = []
+    for key, (name, shape, dtype) in array_specs.items():
+        shm, array = _attach_shared_array(name, shape, dtype)
+        _worker_state["shms"].append(shm)
+        _worker_state[key] = array
+
+
+def _solve_shared_chunk(bounds):
+    start, stop = bounds
+    surface = _worker_state["surface"]
+
+    with warnings.catch_warnings():
+        # failures are counted and reported once by the parent process
+        warnings.simplefilter("ignore", RuntimeWarning)
+        phi_coords, theta_coords, iterations, converged = (
+            centroids_to_theta_phi(
+                _worker_state["centroids"][start:stop],
+                surface.wall_s,
+                surface,
+                _worker_state["num_theta_guesses"],
+                _worker_state["max_iter"],
+                full_output=True,
+                guess_table=_worker_state["guess_table"],
+            )
+        )
+
+    _worker_state["phi_coords"][start:stop] = phi_coords
+    _worker_state["theta_coords"][start:stop] = theta_coords
+    _worker_state["iterations"][start:stop] = iterations
+    _worker_state["converged"][start:stop] = converged
+
+    if instrumentation.enabled:
+        return instrumentation.collect()
+
+
+def multithread_centroids_to_theta_phi(
+    centroids,
+    wall_s,
+    vmec_path,
+    num_theta_guesses,
+    max_iter,
+    num_threads=1,
+    chunk_size=1000,
+    full_output=False,
+    guess_table_path=None,
+    cache_dir=None,
+):
+    """
+    Parallel centroids_to_theta_phi over a pool of worker processes.
+
+    The equilibrium is read and fitted once in this process (or taken from
+    vmec_cache) and handed to each worker when it starts. The centroids and
+    all of the outputs live in shared memory, so chunks are dispatched as
+    (start, stop) bounds and results are written straight into the output
+    arrays. Chunks are small and handed out as workers become free, so
+    elements that are slow to converge don't hold up a whole worker's share
+    of the mesh.
+
+    Arguments:
+        centroids (np array of x,y,z): points at which to perform the root
+            finding
+        wall_s (float): vmec parameter for the surface of interest
+        vmec_path (str or VMECSurface): path to the vmec file, or an
+            already fitted surface for wall_s
+        num_theta_guesses (int): number of evenly spaced theta points to check
+            to determine the starting point for rootfinding
+        max_iter (int): maximum iterations before declaring that the root
+            has failed to converge.
+        num_threads (int): number of worker processes
+        chunk_size (int): number of centroids per dispatched chunk
+        full_output (bool): if True also return the per element iteration
+            counts and convergence flags
+        guess_table_path (str): optional SurfaceLookupTable .npz file for
+            the same equilibrium and wall_s to take initial guesses from
+        cache_dir (str): optional vmec_cache directory to reuse the fitted
+            surface from across runs
+
+    Returns:
+        phi_coords, theta_coords[, iterations, converged]: as for
+            centroids_to_theta_phi
+    """
+    centroids = np.asarray(centroids, dtype=float)
+    num_centroids = len(centroids)
+
+    if isinstance(vmec_path, VMECSurface):
+        surface = as_surface(vmec_path, wall_s)
+    else:
+        surface = vmec_cache.load_surface(
+            vmec_path, wall_s, cache_dir=cache_dir
+        )
+
+    array_dtypes = {
+        "centroids": (centroids.shape, np.float64),
+        "phi_coords": ((num_centroids,), np.float64),
+        "theta_coords": ((num_centroids,), np.float64),
+        "iterations": ((num_centroids,), np.int64),
+        "converged": ((num_centroids,), np.bool_),
+    }
+
+    shms = []
+    arrays = {}
+    array_specs = {}
+    try:
+        for key, (shape, dtype) in array_dtypes.items():
+            # SharedMemory refuses a size of 0
+            nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            shms.append(shm)
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            array_specs[key] = (shm.name, shape, dtype)
+        arrays["centroids"][:] = centroids
+
+        bounds = [
+            (start, min(start + chunk_size, num_centroids))
+            for start in range(0, num_centroids, chunk_size)
+        ]
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_threads,
+            initializer=_init_shared_worker,
+            initargs=(
+                surface,
+                guess_table_path,
+                num_theta_guesses,
+                max_iter,
+                array_specs,
+                instrumentation.enabled,
+                instrumentation.tracing,
+            ),
+        ) as executor:
+            # consuming the iterator also raises worker exceptions here
+            for records in executor.map(_solve_shared_chunk, bounds):
+                if records is not None:
+                    instrumentation.merge(records)
+
+        results = {key: array.copy() for key, array in arrays.items()}
+    finally:
+        # drop the views before closing, numpy holds the buffers otherwise
+        arrays.clear()
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    converged = results["converged"]
+    if not np.all(converged):
+        warnings.warn(
+            f"{np.count_nonzero(~converged)} of {len(converged)} elements "
+            f"failed to converge after {max_iter} iterations",
+            RuntimeWarning,
+        )
+
+    if full_output:
+        return (
+            results["phi_coords"],
+            results["theta_coords"],
+            results["iterations"],
+            converged,
+        )
+
+    return results["phi_coords"], results["theta_coords"]
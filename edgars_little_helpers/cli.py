@@ -0,0 +1,272 @@
+"""
+Command line interface to the helpers.
+
+    little-helpers map-centroids mesh.h5m theta_phi.h5 --vmec wout.nc
+    little-helpers mesh blanket.step shield.step --workers 4
+    little-helpers heating sp.h5 1 1.5e9 heating.h5 --volumes m.h5m
+    little-helpers dpa sp.h5 2 1.5e9 materials.xml steel dpa.h5 --volumes m.h5m
+    little-helpers plot theta_phi.h5 heating.h5 --title "Heating"
+
+Each subcommand imports only what it needs when it runs, so starting the
+CLI, and --help, cost no more than argparse. --profile and --trace write
+the instrumentation records of the run, see instrumentation.py.
+"""
+import argparse
+import json
+
+
+def _map_centroids(args):
+    from . import stream_theta_phi
+    from . import vmec_cache
+
+    surface = vmec_cache.load_surface(
+        args.vmec, args.wall_s, cache_dir=args.cache_dir
+    )
+    guess_table = None
+    if args.guess_table is not None:
+        from . import surface_lookup
+        guess_table = surface_lookup.SurfaceLookupTable.load(args.guess_table)
+
+    num_failed = stream_theta_phi.stream_centroids_to_theta_phi(
+        args.mesh,
+        args.output,
+        args.wall_s,
+        surface,
+        args.num_theta_guesses,
+        args.max_iter,
+        block_size=args.block_size,
+        guess_table=guess_table,
+    )
+    print(f"{num_failed} elements failed to converge")
+
+
+def _mesh(args):
+    from . import makeUmesh
+
+    status = makeUmesh.batchMakeUmesh(
+        args.step,
+        ratio=args.ratio,
+        angle=args.angle,
+        reheal=args.reheal,
+        workers=args.workers,
+        mbconvert=args.mbconvert,
+        keepExodus=args.keep_exodus,
+        cacheDir=args.cache_dir,
+        scratchDir=args.scratch_dir,
+    )
+    print(json.dumps(status, indent=1))
+    if any(entry["error"] is not None for entry in status.values()):
+        raise SystemExit(1)
+
+
+def _dtype(args):
+    import numpy as np
+    return np.float32 if args.float32 else np.float64
+
+
+def _heating(args):
+    from . import tallierizer
+
+    volumes = None
+    if args.volumes is not None:
+        from . import tallierizer_batch
+        volumes = tallierizer_batch.load_volumes(args.volumes)
+
+    tallierizer.streamHeating(
+        args.statepoint,
+        args.tally_id,
+        args.power,
+        args.output,
+        volumes=volumes,
+        chunkSize=args.chunk_size,
+        dtype=_dtype(args),
+        nuclides=args.nuclides,
+    )
+
+
+def _dpa(args):
+    from . import tallierizer
+    from . import tallierizer_batch
+    from . import getMaterial
+
+    registry = getMaterial.MaterialRegistry.from_xml(args.materials)
+    if args.material not in registry:
+        raise SystemExit(f"no material {args.material} in {args.materials}")
+
+    tallierizer.streamDPAIron(
+        args.statepoint,
+        args.tally_id,
+        args.power,
+        args.material,
+        tallierizer_batch.load_volumes(args.volumes),
+        args.output,
+        chunkSize=args.chunk_size,
+        dtype=_dtype(args),
+        registry=registry,
+    )
+
+
+def _plot(args):
+    import h5py
+    from . import plotContour
+
+    with h5py.File(args.coords, "r") as f:
+        phi_coords = f["phi"][()]
+        theta_coords = f["theta"][()]
+    with h5py.File(args.results, "r") as f:
+        solutions = f[args.dataset][()]
+        units = f.attrs.get("units", "")
+    if len(solutions) != len(phi_coords):
+        raise SystemExit(
+            f"{args.results} has {len(solutions)} values but {args.coords} "
+            f"has {len(phi_coords)} elements"
+        )
+
+    renderer = plotContour.ContourRenderer(
+        phi_coords,
+        theta_coords,
+        "phi (degrees)",
+        "theta (degrees)",
+        args.bar_label if args.bar_label is not None else units,
+        kind="tri_log" if args.log else "tri",
+        colormap=args.colormap,
+        limit_line=args.limit_line,
+        decimals=args.decimals,
+    )
+    renderer.render(solutions, args.title, args.output)
+
+
+def _add_tally_arguments(parser):
+    parser.add_argument("statepoint", help="OpenMC statepoint h5 file")
+    parser.add_argument("tally_id", type=int)
+    parser.add_argument("power", type=float, help="device power in W")
+
+
+def _add_output_arguments(parser):
+    parser.add_argument("output", help="HDF5 file to write results to")
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="reduce and store results in single precision",
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="little-helpers",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--profile", help="write instrumentation records as JSON to this file"
+    )
+    parser.add_argument(
+        "--trace", help="write a Chrome trace of the run to this file"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    map_centroids = subparsers.add_parser(
+        "map-centroids",
+        help="theta and phi of every tet centroid of an h5m mesh",
+    )
+    map_centroids.add_argument("mesh", help="h5m mesh")
+    map_centroids.add_argument(
+        "output", help="HDF5 file to write phi and theta to"
+    )
+    map_centroids.add_argument("--vmec", required=True, help="vmec wout file")
+    map_centroids.add_argument("--wall-s", type=float, default=1.08)
+    map_centroids.add_argument("--num-theta-guesses", type=int, default=360)
+    map_centroids.add_argument("--max-iter", type=int, default=100)
+    map_centroids.add_argument("--block-size", type=int, default=100000)
+    map_centroids.add_argument(
+        "--guess-table", help="SurfaceLookupTable .npz for initial guesses"
+    )
+    map_centroids.add_argument(
+        "--cache-dir", help="vmec_cache directory for the fitted surface"
+    )
+    map_centroids.set_defaults(run=_map_centroids)
+
+    mesh = subparsers.add_parser(
+        "mesh", help="tet mesh step files into h5m with Cubit"
+    )
+    mesh.add_argument("step", nargs="+", help="step files")
+    mesh.add_argument("--ratio", type=float, default=100)
+    mesh.add_argument("--angle", type=float, default=5)
+    mesh.add_argument("--reheal", action="store_true")
+    mesh.add_argument("--workers", type=int, default=1)
+    mesh.add_argument(
+        "--mbconvert", help="mbconvert executable to use instead of pymoab"
+    )
+    mesh.add_argument("--keep-exodus", action="store_true")
+    mesh.add_argument("--cache-dir", help="content addressed mesh cache")
+    mesh.add_argument("--scratch-dir", help="directory for exodus files")
+    mesh.set_defaults(run=_mesh)
+
+    heating = subparsers.add_parser(
+        "heating", help="heating in W or W/cm3 from a statepoint tally"
+    )
+    _add_tally_arguments(heating)
+    _add_output_arguments(heating)
+    heating.add_argument(
+        "--volumes", help=".npy volumes in tally order, or the h5m mesh"
+    )
+    heating.add_argument(
+        "--nuclides",
+        nargs="+",
+        help="nuclide bins to sum, default the total bin if there is one",
+    )
+    heating.set_defaults(run=_heating)
+
+    dpa = subparsers.add_parser(
+        "dpa", help="iron DPA per FPY from a statepoint damage-energy tally"
+    )
+    _add_tally_arguments(dpa)
+    dpa.add_argument("materials", help="materials.xml")
+    dpa.add_argument("material", help="name of the material scored in")
+    _add_output_arguments(dpa)
+    dpa.add_argument(
+        "--volumes",
+        required=True,
+        help=".npy volumes in tally order, or the h5m mesh",
+    )
+    dpa.set_defaults(run=_dpa)
+
+    plot = subparsers.add_parser(
+        "plot", help="contour plot of per element results over theta, phi"
+    )
+    plot.add_argument("coords", help="output of map-centroids")
+    plot.add_argument("results", help="output of heating or dpa")
+    plot.add_argument("--dataset", default="mean")
+    plot.add_argument("--title", default="Results")
+    plot.add_argument("--output", help="image file, defaults to title.png")
+    plot.add_argument("--bar-label", help="defaults to the results' units")
+    plot.add_argument("--log", action="store_true")
+    plot.add_argument("--colormap", default="plasma")
+    plot.add_argument("--limit-line", type=float)
+    plot.add_argument("--decimals", type=int, default=1)
+    plot.set_defaults(run=_plot)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    instrumentation = None
+    if args.profile is not None or args.trace is not None:
+        from . import instrumentation
+        instrumentation.enable(trace=args.trace is not None)
+
+    try:
+        args.run(args)
+    finally:
+        if instrumentation is not None:
+            if args.profile is not None:
+                instrumentation.export_json(args.profile)
+            if args.trace is not None:
+                instrumentation.export_chrome_trace(args.trace)
+
+
+if __name__ == "__main__":
+    main()
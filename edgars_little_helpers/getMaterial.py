@@ -0,0 +1,128 @@
+import numpy as np
+
+def getMaterial(materials, material):
+	if isinstance(materials, MaterialRegistry):
+		return materials.get(material)
+	for mat in materials:
+		if mat.name == material:
+			return mat
+			break
+
+def _fingerprint(material):
+	"""
+	what get_nuclide_atom_densities depends on, cheap to compare so cached
+	densities can be checked against it on every lookup
+	"""
+	return (tuple(getattr(material, 'nuclides', ())),
+		getattr(material, 'density', None), getattr(material, 'density_units', None))
+
+class MaterialRegistry:
+	"""
+	Materials indexed by name, built once, so lookups are a dict read
+	rather than a scan like getMaterial. Atom densities are cached per
+	material, both as the dict from get_nuclide_atom_densities() and as
+	arrays in the order of a tally's nuclide filter. A material's cached
+	densities are rebuilt only if its nuclides or density change, or it is
+	replaced with add.
+
+	materials: openmc.Materials or any iterable of materials. The first
+		material with a given name wins, as with getMaterial.
+	"""
+
+	def __init__(self, materials = ()):
+		self._index = {}
+		self._densities = {}
+		self._arrays = {}
+		for material in materials:
+			if material.name not in self._index:
+				self.add(material)
+
+	@classmethod
+	def from_xml(cls, path):
+		"""
+		registry of the materials in a materials.xml
+		"""
+		import openmc
+		return cls(openmc.Materials.from_xml(path))
+
+	def add(self, material):
+		"""
+		index material by its name, replacing any material already there
+		"""
+		self._index[material.name] = material
+		self.invalidate(material.name)
+
+	def invalidate(self, name):
+		"""
+		drop the cached densities of a material, for changes the
+		fingerprint can't see
+		"""
+		self._densities.pop(name, None)
+		for key in [key for key in self._arrays if key[0] == name]:
+			del self._arrays[key]
+
+	def get(self, name):
+		"""
+		returns: material called name, or None like getMaterial
+		"""
+		return self._index.get(name)
+
+	def __getitem__(self, name):
+		return self._index[name]
+
+	def __contains__(self, name):
+		return name in self._index
+
+	def __len__(self):
+		return len(self._index)
+
+	def __iter__(self):
+		return iter(self._index)
+
+	def items(self):
+		return self._index.items()
+
+	def atomDensities(self, name):
+		"""
+		name: material name
+
+		returns:
+		dict of nuclide -> atom density in atoms/b-cm, as
+		get_nuclide_atom_densities(). Shared, don't modify it.
+		"""
+		material = self._index[name]
+		fingerprint = _fingerprint(material)
+		cached = self._densities.get(name)
+		if cached is None or cached[0] != fingerprint:
+			self.invalidate(name)
+			cached = (fingerprint, dict(material.get_nuclide_atom_densities()))
+			self._densities[name] = cached
+		return cached[1]
+
+	def densityArray(self, name, nuclides):
+		"""
+		name: material name
+		nuclides: nuclide names in tally filter order
+
+		returns:
+		read only array of the atom density of each nuclide in atoms/b-cm,
+		0 for nuclides not in the material
+		"""
+		atomDensities = self.atomDensities(name)
+		key = (name, tuple(nuclides))
+		if key not in self._arrays:
+			array = np.array([atomDensities.get(nuclide, 0.0) for nuclide in nuclides])
+			array.flags.writeable = False
+			self._arrays[key] = array
+		return self._arrays[key]
+
+	def nuclideDensity(self, name, nuclides):
+		"""
+		name: material name
+		nuclides: names of the nuclides to count
+
+		returns:
+		total atom density of the nuclides in atoms/cm3, as
+		tallierizer.ironDensity
+		"""
+		return self.densityArray(name, nuclides).sum()/(1e-24)
@@ -0,0 +1,322 @@
+import os
+import h5py
+import numpy as np
+
+
+class _NodeRows(object):
+    """
+    Node coordinates of a chunked (e.g. compressed) dataset, which can't be
+    memory mapped. Indexing with an array of node ids reads only the
+    dataset chunks holding those nodes, so memory follows the number of
+    nodes asked for rather than the size of the mesh.
+
+    Arguments:
+        dataset (h5py dataset): num nodes X 3 coordinates
+    """
+
+    # rows read at a time when the dataset isn't chunked
+    default_chunk_rows = 65536
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.shape = dataset.shape
+        self.dtype = dataset.dtype
+        if dataset.chunks is None:
+            self.chunk_rows = self.default_chunk_rows
+        else:
+            self.chunk_rows = dataset.chunks[0]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, node_ids):
+        node_ids = np.asarray(node_ids)
+        unique, inverse = np.unique(node_ids, return_inverse=True)
+        rows = np.empty((len(unique),) + self.shape[1:], dtype=self.dtype)
+
+        # neighbouring chunks are read together, in spans no longer than
+        # the rows asked for
+        max_chunks = max(1, len(unique) // self.chunk_rows)
+        spans = []
+        for chunk in np.unique(unique // self.chunk_rows):
+            if (
+                spans
+                and spans[-1][1] == chunk
+                and spans[-1][1] - spans[-1][0] < max_chunks
+            ):
+                spans[-1][1] = chunk + 1
+            else:
+                spans.append([chunk, chunk + 1])
+
+        for first_chunk, stop_chunk in spans:
+            low = first_chunk * self.chunk_rows
+            high = min(stop_chunk * self.chunk_rows, self.shape[0])
+            first, stop = np.searchsorted(unique, [low, high])
+            rows[first:stop] = self.dataset[low:high][unique[first:stop] - low]
+
+        return rows[inverse.reshape(node_ids.shape)]
+
+
+def _node_coordinates(h5m):
+    """
+    Return the node coordinates of an open h5m file, memory mapped when
+    they are stored contiguously, so they are never read into memory whole.
+    Otherwise only the rows indexed are read, see _NodeRows.
+    """
+    dataset = h5m["tstt/nodes/coordinates"]
+    offset = dataset.id.get_offset()
+    if dataset.chunks is None and offset is not None:
+        return np.memmap(
+            h5m.filename,
+            mode="r",
+            dtype=dataset.dtype,
+            shape=dataset.shape,
+            offset=offset,
+        )
+    return _NodeRows(dataset)
+
+
+def tet_connectivity(h5m, element_group="Tet4"):
+    """
+    Return the tet connectivity dataset of an open h5m file and the file id
+    of the first node, which connectivity entries are offset by.
+
+    Arguments:
+        h5m (h5py File): open MOAB h5m mesh
+        element_group (str): name of the element group holding the tets
+
+    Returns:
+        connectivity (h5py dataset): num elements X 4 node file ids
+        node_start_id (int): file id of the first node
+    """
+    connectivity = h5m[f"tstt/elements/{element_group}/connectivity"]
+    node_start_id = int(h5m["tstt/nodes/coordinates"].attrs["start_id"])
+
+    return connectivity, node_start_id
+
+
+def iter_tet_vertices(path, block_size=100000, start=0):
+    """
+    Yield the vertex coordinates of the tets in an h5m mesh in blocks, in
+    element order, without loading the whole mesh.
+
+    Arguments:
+        path (str): path to h5m file, such as the output of makeUmesh
+        block_size (int): maximum number of tets per block
+        start (int): index of the first element to yield
+
+    Yields:
+        start (int): index of the first element in the block
+        vertices (np array): tets X 4 X 3 vertex coordinates
+    """
+    with h5py.File(path, "r") as h5m:
+        connectivity, node_start_id = tet_connectivity(h5m)
+        coordinates = _node_coordinates(h5m)
+
+        for block_start in range(start, len(connectivity), block_size):
+            node_ids = (
+                connectivity[block_start : block_start + block_size]
+                - node_start_id
+            )
+            yield block_start, coordinates[node_ids]
+
+
+def iter_tet_centroids(path, block_size=100000, start=0):
+    """
+    Yield the centroids of the tets in an h5m mesh in blocks, in element
+    order, without loading the whole mesh.
+
+    Arguments:
+        path (str): path to h5m file, such as the output of makeUmesh
+        block_size (int): maximum number of centroids per block
+        start (int): index of the first element to yield
+
+    Yields:
+        start (int): index of the first element in the block
+        centroids (np array of x,y,z): centroid of each tet in the block
+    """
+    for block_start, vertices in iter_tet_vertices(path, block_size, start):
+        yield block_start, vertices.mean(axis=1)
+
+
+def tet_signed_volumes(vertices):
+    """
+    Return the signed volume of each tet, positive for the usual right
+    handed node ordering.
+
+    Arguments:
+        vertices (np array): tets X 4 X 3 vertex coordinates
+
+    Returns:
+        volumes (1D np array)
+    """
+    edges = vertices[:, 1:] - vertices[:, :1]
+
+    return np.linalg.det(edges) / 6
+
+
+def tet_mean_ratio(vertices, volumes=None):
+    """
+    Return the mean ratio quality of each tet, 12 (3 |V|)^(2/3) divided by
+    the sum of its squared edge lengths. It is 1 for a regular tet and goes
+    to 0 as the tet degenerates.
+
+    Arguments:
+        vertices (np array): tets X 4 X 3 vertex coordinates
+        volumes (1D np array): signed volumes if already computed
+
+    Returns:
+        quality (1D np array)
+    """
+    if volumes is None:
+        volumes = tet_signed_volumes(vertices)
+
+    edge_sq = np.zeros(len(vertices))
+    for a, b in ((0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)):
+        edge = vertices[:, a] - vertices[:, b]
+        edge_sq += np.einsum("ij,ij->i", edge, edge)
+
+    return 12 * np.cbrt(3 * np.abs(volumes)) ** 2 / edge_sq
+
+
+def mesh_statistics(path, quality_bins=10, block_size=100000):
+    """
+    Read back an h5m mesh a block at a time and summarize it, as a check
+    that it is usable before handing it to transport.
+
+    Arguments:
+        path (str): path to h5m file
+        quality_bins (int): number of mean ratio histogram bins over [0, 1]
+        block_size (int): tets read at a time
+
+    Returns:
+        statistics (dict): num_tets, num_nodes, total_volume, min_volume,
+            max_volume, num_inverted (tets with non-positive volume),
+            quality_bin_edges, quality_counts and min_quality
+    """
+    with h5py.File(path, "r") as h5m:
+        num_nodes = len(h5m["tstt/nodes/coordinates"])
+
+    bin_edges = np.linspace(0, 1, quality_bins + 1)
+    counts = np.zeros(quality_bins, dtype=np.int64)
+    statistics = {
+        "num_tets": 0,
+        "num_nodes": num_nodes,
+        "total_volume": 0.0,
+        "min_volume": np.inf,
+        "max_volume": -np.inf,
+        "num_inverted": 0,
+        "min_quality": np.inf,
+    }
+
+    for _, vertices in iter_tet_vertices(path, block_size):
+        volumes = tet_signed_volumes(vertices)
+        quality = tet_mean_ratio(vertices, volumes)
+
+        statistics["num_tets"] += len(volumes)
+        statistics["total_volume"] += float(np.sum(np.abs(volumes)))
+        statistics["min_volume"] = min(
+            statistics["min_volume"], float(volumes.min())
+        )
+        statistics["max_volume"] = max(
+            statistics["max_volume"], float(volumes.max())
+        )
+        statistics["num_inverted"] += int(np.count_nonzero(volumes <= 0))
+        statistics["min_quality"] = min(
+            statistics["min_quality"], float(quality.min())
+        )
+        counts += np.histogram(np.clip(quality, 0, 1), bin_edges)[0]
+
+    statistics["quality_bin_edges"] = bin_edges.tolist()
+    statistics["quality_counts"] = counts.tolist()
+
+    return statistics
+
+
+def tet_centroids_and_volumes(path, block_size=100000, output_dir=None):
+    """
+    Return the centroid and volume of every tet in an h5m mesh, in element
+    order, which is the order OpenMC's UnstructuredMesh numbers the mesh
+    filter bins in. The mesh is read once, a block at a time, and both are
+    computed from the same vertex block.
+
+    The centroids can go straight to centroids_to_theta_phi and the volumes
+    to the volumes argument of calcHeating and calcDPAIron.
+
+    Arguments:
+        path (str): path to h5m file, such as the output of makeUmesh
+        block_size (int): tets read at a time
+        output_dir (str): optional directory to write centroids.npy and
+            volumes.npy to. The arrays returned are then memory mapped onto
+            those files rather than held in memory, and can be reopened
+            later with np.load(..., mmap_mode="r").
+
+    Returns:
+        centroids (np array): num tets X 3
+        volumes (1D np array): unsigned volume of each tet
+    """
+    num_tets = count_tets(path)
+
+    if output_dir is None:
+        centroids = np.empty((num_tets, 3))
+        volumes = np.empty(num_tets)
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        centroids = np.lib.format.open_memmap(
+            os.path.join(output_dir, "centroids.npy"),
+            mode="w+",
+            dtype=np.float64,
+            shape=(num_tets, 3),
+        )
+        volumes = np.lib.format.open_memmap(
+            os.path.join(output_dir, "volumes.npy"),
+            mode="w+",
+            dtype=np.float64,
+            shape=(num_tets,),
+        )
+
+    for start, vertices in iter_tet_vertices(path, block_size):
+        stop = start + len(vertices)
+        np.mean(vertices, axis=1, out=centroids[start:stop])
+        np.abs(tet_signed_volumes(vertices), out=volumes[start:stop])
+
+    if output_dir is not None:
+        centroids.flush()
+        volumes.flush()
+
+    return centroids, volumes
+
+
+def tet_volumes(path, block_size=100000):
+    """
+    Return the volume of every tet in an h5m mesh in element order, as
+    tet_centroids_and_volumes does but without the centroids.
+
+    Arguments:
+        path (str): path to h5m file, such as the output of makeUmesh
+        block_size (int): tets read at a time
+
+    Returns:
+        volumes (1D np array): unsigned volume of each tet
+    """
+    volumes = np.empty(count_tets(path))
+
+    for start, vertices in iter_tet_vertices(path, block_size):
+        stop = start + len(vertices)
+        np.abs(tet_signed_volumes(vertices), out=volumes[start:stop])
+
+    return volumes
+
+
+def count_tets(path):
+    """
+    Return the number of tets in an h5m mesh.
+
+    Arguments:
+        path (str): path to h5m file
+
+    Returns:
+        num_tets (int)
+    """
+    with h5py.File(path, "r") as h5m:
+        return len(tet_connectivity(h5m)[0])
@@ -0,0 +1,258 @@
+"""
+Opt-in timers, counters and histograms for the hot paths of the helpers.
+
+Everything is off until enable() is called. While off, timer() hands back a
+shared do-nothing context manager and count() and histogram() return
+straight away, so the instrumented code pays a function call and nothing
+else. Records are kept per process; worker processes send theirs back with
+collect() and the parent folds them in with merge(), as
+multithread_centroids_to_theta_phi does.
+
+    from edgars_little_helpers import instrumentation
+    instrumentation.enable(trace=True)
+    ...
+    instrumentation.export_json("profile.json")
+    instrumentation.export_chrome_trace("trace.json")  # chrome://tracing
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+enabled = False
+tracing = False
+
+_lock = threading.RLock()
+_timers = {}
+_counters = {}
+_histograms = {}
+_events = []
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def enable(trace=False):
+    """
+    Start recording.
+
+    Arguments:
+        trace (bool): also keep every timed span, for export_chrome_trace
+    """
+    global enabled, tracing
+    enabled = True
+    tracing = trace
+
+
+def disable():
+    """Stop recording, keeping what has been recorded so far"""
+    global enabled, tracing
+    enabled = False
+    tracing = False
+
+
+def reset():
+    """Forget everything recorded in this process"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _histograms.clear()
+        _events.clear()
+
+
+def _record_time(name, start_ns, stop_ns):
+    seconds = (stop_ns - start_ns) * 1e-9
+    with _lock:
+        record = _timers.get(name)
+        if record is None:
+            _timers[name] = {
+                "count": 1,
+                "total": seconds,
+                "min": seconds,
+                "max": seconds,
+            }
+        else:
+            record["count"] += 1
+            record["total"] += seconds
+            record["min"] = min(record["min"], seconds)
+            record["max"] = max(record["max"], seconds)
+        if tracing:
+            _events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start_ns / 1000,
+                    "dur": (stop_ns - start_ns) / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+
+class _Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record_time(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+def timer(name):
+    """
+    Context manager timing the block it wraps under name.
+
+        with instrumentation.timer("makeUmesh.convert"):
+            ...
+    """
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    """Decorator timing every call of a function under name"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    """Add n to the counter name"""
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + int(n)
+
+
+def histogram(name, values, bins):
+    """
+    Add values to the histogram name.
+
+    Arguments:
+        name (str)
+        values (np array)
+        bins (np array): bin edges, must be the same every time name is used
+    """
+    if not enabled:
+        return
+    bins = np.asarray(bins, dtype=float)
+    counts = np.histogram(values, bins)[0]
+    with _lock:
+        record = _histograms.get(name)
+        if record is None:
+            _histograms[name] = {"edges": bins, "counts": counts}
+        elif not np.array_equal(record["edges"], bins):
+            raise ValueError(f"histogram {name} was started with other bins")
+        else:
+            record["counts"] += counts
+
+
+def snapshot():
+    """
+    Everything recorded in this process, as JSON serializable dicts.
+
+    Returns:
+        records (dict): timers (name -> count, total, min and max seconds),
+            counters (name -> int), histograms (name -> edges and counts)
+            and events (trace spans, empty unless tracing)
+    """
+    with _lock:
+        return {
+            "timers": {name: dict(t) for name, t in _timers.items()},
+            "counters": dict(_counters),
+            "histograms": {
+                name: {
+                    "edges": h["edges"].tolist(),
+                    "counts": h["counts"].tolist(),
+                }
+                for name, h in _histograms.items()
+            },
+            "events": list(_events),
+        }
+
+
+def collect():
+    """snapshot() then reset(), for workers handing records to a parent"""
+    with _lock:
+        records = snapshot()
+        reset()
+    return records
+
+
+def merge(records):
+    """
+    Add records from snapshot() or collect() in another process to this
+    process's.
+    """
+    with _lock:
+        for name, other in records["timers"].items():
+            record = _timers.get(name)
+            if record is None:
+                _timers[name] = dict(other)
+                continue
+            record["count"] += other["count"]
+            record["total"] += other["total"]
+            record["min"] = min(record["min"], other["min"])
+            record["max"] = max(record["max"], other["max"])
+
+        for name, n in records["counters"].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+        for name, other in records["histograms"].items():
+            edges = np.asarray(other["edges"], dtype=float)
+            counts = np.asarray(other["counts"], dtype=np.int64)
+            record = _histograms.get(name)
+            if record is None:
+                _histograms[name] = {"edges": edges, "counts": counts}
+            elif not np.array_equal(record["edges"], edges):
+                raise ValueError(f"histogram {name} has different bins")
+            else:
+                record["counts"] += counts
+
+        _events.extend(records["events"])
+
+
+def export_json(path):
+    """Write snapshot() to path"""
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=1)
+
+
+def export_chrome_trace(path):
+    """
+    Write the traced spans, and the final value of every counter, in the
+    Chrome trace event format, for chrome://tracing or Perfetto. Spans are
+    only kept while enabled with trace=True.
+    """
+    records = snapshot()
+    events = records["events"]
+    end = max((e["ts"] + e["dur"] for e in events), default=0)
+    for name, n in records["counters"].items():
+        events.append(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": end,
+                "pid": os.getpid(),
+                "args": {"value": n},
+            }
+        )
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
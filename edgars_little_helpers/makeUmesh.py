@@ -0,0 +1,424 @@
+import os
+import inspect
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import json
+import concurrent.futures
+from . import instrumentation
+from .h5m_mesh import mesh_statistics
+
+# if this fails to mesh, try importing the step into cubit,
+# click the hammer button under geometry, then select volumes
+# then heal -> autoheal and let that try to fix it, worked for me
+# setting reheal to true will automate this
+
+_cubitInitialized = False
+
+#converter threads of a batch store and evict concurrently
+_cacheLock = threading.Lock()
+
+def initCubit():
+	"""
+	Initialize Cubit without graphics or journaling. Only happens once per
+	process, later calls do nothing.
+	"""
+	global _cubitInitialized
+	if _cubitInitialized:
+		return
+	import cubit
+	# Retrieve Cubit module directory
+	cubit_dir = os.path.dirname(inspect.getfile(cubit))
+	# Append plugins directory to Cubit module directory
+	cubit_dir = cubit_dir + '/plugins/'
+	# Initialize Cubit
+	cubit.init([
+	    'cubit',
+	    '-nojournal',
+	    '-nographics',
+	    '-information', 'off',
+	    '-warning', 'off',
+	    '-commandplugindir',
+	    cubit_dir
+	])
+	_cubitInitialized = True
+
+@instrumentation.timed('makeUmesh.mesh')
+def meshStep(inName, ratio = 100, angle = 5, reheal=False, exodusDir = None):
+	"""
+	Mesh a step file in an already initialized Cubit and export it to
+	exodus, see makeUmesh.
+
+	Arguments:
+		inName (str): path to step file
+		ratio (float): cubit coarse mesh setting
+		angle (float): cubit coarse mesh setting
+		reheal (bool): run the autohealer on the imported volume
+		exodusDir (str): directory for the exodus file, such as local
+			scratch. Defaults to the current working directory, which is
+			always where the h5m goes.
+
+	Returns:
+		outName (str): path of the exodus file written
+		h5mName (str): path the h5m should be converted to
+	"""
+	import cubit
+	cubit.cmd('reset')
+
+	#import given step
+	cubit.cmd('import step "' + inName + '" heal')
+
+	if reheal:
+		cubit.cmd('healer autoheal volume 1 rebuild')
+		cubit.cmd('compress')
+
+	cubit.cmd(f'set trimesher coarse on ratio {ratio} angle {angle}')
+	cubit.cmd('surface all scheme trimesh')
+
+	#set meshing scheme and mesh
+	cubit.cmd('volume 1 scheme tetmesh')
+	cubit.cmd('mesh volume 1')
+
+	baseName = os.path.splitext(os.path.basename(inName))[0]
+	outName = os.path.abspath(os.path.join(exodusDir or '', baseName + '.e'))
+	h5mName = os.path.abspath(baseName + '.h5m')
+
+	cubit.cmd('export mesh "' + outName + '"  overwrite ')
+
+	cubit.cmd('reset')
+
+	return outName, h5mName
+
+@instrumentation.timed('makeUmesh.convert')
+def convertExodus(outName, h5mName, mbconvert = None, keepExodus = False):
+	"""
+	Convert an exodus file to h5m, raising if it fails. Done in process
+	through pymoab if it is installed, otherwise with mbconvert.
+
+	Arguments:
+		outName (str): path to exodus file
+		h5mName (str): path to write the h5m to
+		mbconvert (str): mbconvert executable to use instead of pymoab
+		keepExodus (bool): if False the exodus file is deleted afterwards
+	"""
+	moabCore = None
+	if mbconvert is None:
+		try:
+			from pymoab import core as moabCore
+		except ImportError:
+			pass
+
+	if moabCore is not None:
+		mb = moabCore.Core()
+		mb.load_file(outName)
+		mb.write_file(h5mName)
+	else:
+		subprocess.run([mbconvert or 'mbconvert', outName, h5mName], check=True,
+			stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+	if not keepExodus:
+		os.remove(outName)
+
+@instrumentation.timed('makeUmesh.validate')
+def validateMesh(h5mName, qualityBins = 10):
+	"""
+	Read back a converted h5m, check it holds tets and write its element
+	count, volume totals and mean ratio quality histogram (see
+	h5m_mesh.mesh_statistics) to a .stats.json next to it.
+
+	Arguments:
+		h5mName (str): path to h5m file
+		qualityBins (int): number of quality histogram bins
+
+	Returns:
+		statistics (dict)
+	"""
+	try:
+		statistics = mesh_statistics(h5mName, qualityBins)
+	except KeyError:
+		#no Tet4 group (or no nodes at all) is what an empty mesh looks like
+		raise ValueError(f'{h5mName} contains no tets') from None
+	if statistics['num_tets'] == 0:
+		raise ValueError(f'{h5mName} contains no tets')
+
+	with open(os.path.splitext(h5mName)[0] + '.stats.json', 'w') as f:
+		json.dump(statistics, f, indent=1)
+
+	return statistics
+
+def makeUmesh(inName, ratio = 100, angle = 5, reheal=False, scratchDir = None):
+	"""
+	Attempts to mesh step file using coarse mesh settings for the surface,
+	and tetmeshing the interior. This is particularly for thin volumes
+	in which large, flat elements are desired.
+
+	Export to exodus then converts it to h5m, see convertExodus.
+
+	Deletes the exodus file automatically so watch out if you don't want that
+
+	The h5m is read back and its statistics written next to it, see
+	validateMesh.
+
+	Arguments:
+		inName (str): path to step file
+		ratio (float): cubit coarse mesh setting
+		angle (float): cubit coarse mesh setting
+		scratchDir (str): optional local scratch directory for the
+			intermediate exodus file
+
+	Returns:
+		statistics (dict): see validateMesh
+	"""
+	initCubit()
+
+	with tempfile.TemporaryDirectory(dir=scratchDir) as exodusDir:
+		outName, h5mName = meshStep(inName, ratio, angle, reheal, exodusDir)
+		print('export mesh "' + outName + '"  overwrite ')
+
+		convertExodus(outName, h5mName)
+
+	return validateMesh(h5mName)
+
+def _initMeshWorker(instrument, trace):
+	instrumentation.reset()
+	if instrument:
+		instrumentation.enable(trace)
+	initCubit()
+
+def _meshJob(inName, ratio, angle, reheal, scratchDir):
+	start = time.perf_counter()
+	#a directory of its own, so jobs never share an exodus file
+	baseName = os.path.splitext(os.path.basename(inName))[0]
+	exodusDir = tempfile.mkdtemp(prefix=baseName + '-', dir=scratchDir or os.getcwd())
+	try:
+		outName, h5mName = meshStep(inName, ratio, angle, reheal, exodusDir)
+	except BaseException:
+		shutil.rmtree(exodusDir, ignore_errors=True)
+		raise
+	records = instrumentation.collect() if instrumentation.enabled else None
+	return outName, h5mName, time.perf_counter() - start, records
+
+def batchMakeUmesh(inNames, ratio = 100, angle = 5, reheal = False, workers = 1,
+	mbconvert = None, keepExodus = False, cacheDir = None, maxCacheBytes = None,
+	scratchDir = None):
+	"""
+	makeUmesh for many step files at once.
+
+	Meshing runs in a pool of worker processes that each initialize Cubit
+	once. Each exodus file is converted and validated in the background as soon
+	as it is written, so conversion overlaps with the next meshing jobs.
+	A file that fails to mesh or convert doesn't stop the others.
+
+	Each h5m is written to the current directory under its step file's
+	basename, so the step files must have distinct basenames. Each exodus
+	file goes in a directory of its own under scratchDir.
+
+	Arguments:
+		inNames (list of str): paths to step files
+		ratio (float): cubit coarse mesh setting
+		angle (float): cubit coarse mesh setting
+		reheal (bool): run the autohealer on each imported volume
+		workers (int): number of meshing processes
+		mbconvert (str): mbconvert executable to use instead of pymoab
+		keepExodus (bool): if False exodus files and their directories are
+			deleted after conversion
+		scratchDir (str): optional directory for the exodus files, such as
+			local scratch. Defaults to the current directory.
+		cacheDir (str): optional mesh cache, see cachedMakeUmesh. Step files
+			already in it aren't meshed and their cached h5m is returned.
+		maxCacheBytes (int): size limit of the mesh cache. Meshes of this
+			batch's step files are never evicted by it.
+
+	Returns:
+		status (dict): step path -> dict of 'h5m' path, 'exodus' path (None
+			unless keepExodus), 'mesh_seconds', 'convert_seconds',
+			'statistics' (see validateMesh, None for cache hits) and 'error'
+			(None if it succeeded)
+	"""
+	h5mNames = {}
+	for inName in inNames:
+		h5mName = os.path.splitext(os.path.basename(inName))[0] + '.h5m'
+		if h5mName in h5mNames:
+			raise ValueError(f'{inName} and {h5mNames[h5mName]} would both be meshed to {h5mName}')
+		h5mNames[h5mName] = inName
+
+	status = {inName: {'h5m': None, 'exodus': None, 'mesh_seconds': None,
+		'convert_seconds': None, 'statistics': None, 'error': None}
+		for inName in inNames}
+
+	keys = {}
+	if cacheDir is not None:
+		for inName in inNames:
+			keys[inName] = meshCacheKey(inName, ratio, angle, reheal)
+			cached = lookupMesh(cacheDir, keys[inName])
+			if cached is not None:
+				status[inName]['h5m'] = cached
+		inNames = [inName for inName in inNames if status[inName]['h5m'] is None]
+
+	keep = {_cachedPath(cacheDir, key) for key in keys.values()}
+
+	def convert(inName, outName, h5mName):
+		start = time.perf_counter()
+		try:
+			convertExodus(outName, h5mName, mbconvert, keepExodus)
+		finally:
+			if not keepExodus:
+				shutil.rmtree(os.path.dirname(outName), ignore_errors=True)
+		statistics = validateMesh(h5mName)
+		if cacheDir is not None:
+			storeMesh(cacheDir, keys[inName], h5mName, maxCacheBytes, keep)
+		return time.perf_counter() - start, statistics
+
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+		initializer=_initMeshWorker,
+		initargs=(instrumentation.enabled, instrumentation.tracing)) as meshers, \
+		concurrent.futures.ThreadPoolExecutor(max_workers=workers) as converters:
+
+		meshing = {meshers.submit(_meshJob, inName, ratio, angle, reheal, scratchDir): inName
+			for inName in inNames}
+		converting = {}
+
+		for future in concurrent.futures.as_completed(meshing):
+			inName = meshing[future]
+			try:
+				outName, h5mName, seconds, records = future.result()
+			except Exception as error:
+				status[inName]['error'] = f'meshing failed: {error!r}'
+				continue
+			if records is not None:
+				instrumentation.merge(records)
+			status[inName]['mesh_seconds'] = seconds
+			if keepExodus:
+				status[inName]['exodus'] = outName
+			converting[converters.submit(convert, inName, outName, h5mName)] = (inName, h5mName)
+
+		for future in concurrent.futures.as_completed(converting):
+			inName, h5mName = converting[future]
+			try:
+				seconds, statistics = future.result()
+				status[inName]['convert_seconds'] = seconds
+				status[inName]['statistics'] = statistics
+				status[inName]['h5m'] = h5mName
+			except subprocess.CalledProcessError as error:
+				status[inName]['error'] = f'mbconvert failed: {error.stderr.decode().strip()}'
+			except Exception as error:
+				status[inName]['error'] = f'conversion failed: {error!r}'
+
+	return status
+
+def meshCacheKey(inName, ratio = 100, angle = 5, reheal = False):
+	"""
+	Key identifying a mesh by the contents of its step file and the
+	meshing settings, so renamed or copied step files still hit.
+
+	Returns:
+		key (str): hex digest
+	"""
+	sha = hashlib.sha256()
+	with open(inName, 'rb') as f:
+		for block in iter(lambda: f.read(1 << 20), b''):
+			sha.update(block)
+	sha.update(repr((float(ratio), float(angle), bool(reheal))).encode())
+	return sha.hexdigest()
+
+def _cachedPath(cacheDir, key):
+	return os.path.abspath(os.path.join(cacheDir, key + '.h5m'))
+
+def lookupMesh(cacheDir, key):
+	"""
+	Return the absolute path of the cached h5m for key, marking it as
+	recently used, or None.
+	"""
+	path = _cachedPath(cacheDir, key)
+	# modification time orders the cache for eviction
+	try:
+		os.utime(path)
+	except FileNotFoundError:
+		return None
+	return path
+
+def storeMesh(cacheDir, key, h5mName, maxBytes = None, keep = ()):
+	"""
+	Copy an h5m into the cache, then evict least recently used meshes
+	beyond maxBytes, other than the new one and those in keep. The cache
+	always holds its own copy, never a link, so re-meshing over h5mName
+	later can't change a cached mesh.
+
+	Returns:
+		path (str): absolute path of the cached h5m
+	"""
+	os.makedirs(cacheDir, exist_ok=True)
+	path = _cachedPath(cacheDir, key)
+	# copy then rename so readers never see a partial file
+	fd, tempPath = tempfile.mkstemp(suffix='.tmp', dir=cacheDir)
+	os.close(fd)
+	shutil.copy2(h5mName, tempPath)
+	os.replace(tempPath, path)
+	os.utime(path)
+
+	if maxBytes is not None:
+		evictMeshes(cacheDir, maxBytes, keep=set(keep) | {path})
+	return path
+
+def evictMeshes(cacheDir, maxBytes, keep = ()):
+	"""
+	Delete the least recently used cached meshes until the cache is no
+	larger than maxBytes. Paths in keep are never deleted.
+	"""
+	keep = {os.path.abspath(path) for path in keep}
+	with _cacheLock:
+		entries = []
+		for name in os.listdir(cacheDir):
+			if not name.endswith('.h5m'):
+				continue
+			path = os.path.abspath(os.path.join(cacheDir, name))
+			try:
+				stat = os.stat(path)
+			except FileNotFoundError:
+				#evicted by another process sharing the cache
+				continue
+			entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+		total = sum(entry[1] for entry in entries)
+		for mtime, size, path in sorted(entries):
+			if total <= maxBytes:
+				break
+			if path in keep:
+				continue
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			total -= size
+
+def cachedMakeUmesh(inName, cacheDir, ratio = 100, angle = 5, reheal = False, maxBytes = None):
+	"""
+	makeUmesh through a content addressed cache. If the same step contents
+	have been meshed with the same settings before the cached h5m is
+	returned straight away, otherwise the step is meshed and the result
+	added to the cache.
+
+	Arguments:
+		inName (str): path to step file
+		cacheDir (str): directory holding the cached h5m files
+		ratio (float): cubit coarse mesh setting
+		angle (float): cubit coarse mesh setting
+		reheal (bool): run the autohealer on the imported volume
+		maxBytes (int): size limit of the cache, least recently used meshes
+			are evicted beyond it. None for no limit.
+
+	Returns:
+		path (str): absolute path of the cached h5m
+	"""
+	key = meshCacheKey(inName, ratio, angle, reheal)
+	path = lookupMesh(cacheDir, key)
+	if path is not None:
+		return path
+
+	makeUmesh(inName, ratio, angle, reheal)
+	h5mName = os.path.abspath(os.path.splitext(os.path.basename(inName))[0] + '.h5m')
+
+	return storeMesh(cacheDir, key, h5mName, maxBytes)
@@ -0,0 +1,536 @@
+import concurrent.futures
+import hashlib
+import time
+from collections import OrderedDict
+from . import instrumentation
+from decimal import Decimal
+import numpy as np
+
+# number of triangulated point sets kept by get_triangulation
+max_cached_triangulations = 8
+
+_triangulations = OrderedDict()
+
+
+_matplotlib_ready = False
+
+
+def _setup_matplotlib():
+    """
+    Switch to the agg backend and autolayout, the first time something is
+    plotted rather than when this module is imported.
+    """
+    global _matplotlib_ready
+    if not _matplotlib_ready:
+        from matplotlib import rcParams, use
+
+        use("agg")
+        rcParams.update({"figure.autolayout": True})
+        _matplotlib_ready = True
+
+
+def _pyplot():
+    _setup_matplotlib()
+    import matplotlib.pyplot as pl
+
+    return pl
+
+
+def sciFormat(num):
+    num = "%.1E" % Decimal(str(num))
+    return num
+
+
+def _coords_key(x, y):
+    sha = hashlib.sha1()
+    for coords in (x, y):
+        coords = np.ascontiguousarray(coords, dtype=np.float64)
+        sha.update(repr(coords.shape).encode())
+        sha.update(coords.data)
+    return sha.hexdigest()
+
+
+def get_triangulation(x, y):
+    """
+    Return the Delaunay triangulation of the points x, y, reusing the one
+    made for earlier arrays with the same contents if there is one. Its
+    TriFinder is built along with it, so interpolating on it later doesn't
+    have to.
+
+    Arguments:
+        x, y (1D np arrays): point coordinates, such as the phi and theta
+            of mesh elements from centroids_to_theta_phi
+
+    Returns:
+        triangulation (matplotlib.tri.Triangulation)
+    """
+    from matplotlib.tri import Triangulation
+
+    key = _coords_key(x, y)
+    if key in _triangulations:
+        _triangulations.move_to_end(key)
+        return _triangulations[key]
+
+    triangulation = Triangulation(x, y)
+    triangulation.get_trifinder()
+    _triangulations[key] = triangulation
+    while len(_triangulations) > max_cached_triangulations:
+        _triangulations.popitem(last=False)
+
+    return triangulation
+
+
+def interpolate_tri(solutions, x, y, xi, yi, triangulation=None):
+    """
+    Linearly interpolate values known at the points x, y to the points
+    xi, yi, using the cached triangulation of x, y.
+
+    Arguments:
+        solutions (1D np array): values at x, y
+        x, y (1D np arrays): point coordinates
+        xi, yi (np arrays): points to interpolate to
+        triangulation (matplotlib.tri.Triangulation): of x, y if already made
+
+    Returns:
+        values (masked np array): masked outside the triangulation
+    """
+    from matplotlib.tri import LinearTriInterpolator
+
+    if triangulation is None:
+        triangulation = get_triangulation(x, y)
+    interpolator = LinearTriInterpolator(
+        triangulation, solutions, trifinder=triangulation.get_trifinder()
+    )
+    return interpolator(xi, yi)
+
+
+@instrumentation.timed("plotContour.plot_tri_contour")
+def plot_tri_contour(
+    solutions,
+    x,
+    y,
+    xlabel,
+    ylabel,
+    bar_label,
+    title,
+    filename=None,
+    colormap="plasma",
+    levels=None,
+    limit_line=0.2,
+    decimals=1,
+    triangulation=None,
+):
+    from matplotlib import ticker
+
+    pl = _pyplot()
+
+    if triangulation is None:
+        triangulation = get_triangulation(x, y)
+    fig = pl.figure(figsize=(8, 6.4))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    c = ax.tricontourf(triangulation, solutions, levels=levels, cmap=colormap)
+    l = ax.tricontour(
+        triangulation, solutions, colors="black", levels=[limit_line]
+    )
+    ax.clabel(l, l.levels, inline=True, fontsize=10, fmt=sciFormat)
+    fig.colorbar(
+        c,
+        ax=ax,
+        label=bar_label,
+        format=ticker.FormatStrFormatter(f"%.{decimals}f"),
+    )
+    if filename is not None:
+        fig.savefig(filename)
+    else:
+        fig.savefig(title + ".png")
+    pl.close()
+
+
+@instrumentation.timed("plotContour.plot_tri_contour_log")
+def plot_tri_contour_log(
+    solutions,
+    x,
+    y,
+    xlabel,
+    ylabel,
+    bar_label,
+    title,
+    filename=None,
+    limit_line=1e18,
+    colormap="plasma",
+    levels=None,
+    decimals=1,
+    triangulation=None,
+):
+    from matplotlib import ticker
+    from matplotlib.colors import LogNorm
+
+    pl = _pyplot()
+
+    print("beep")
+    if triangulation is None:
+        triangulation = get_triangulation(x, y)
+    fig = pl.figure(figsize=(8, 6.4))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    c = ax.tricontourf(
+        triangulation, solutions, levels=levels, norm=LogNorm(), cmap=colormap
+    )
+    l = ax.tricontour(
+        triangulation, solutions, colors="black", levels=[limit_line]
+    )
+    ax.clabel(l, l.levels, inline=True, fontsize=10, fmt=sciFormat)
+    fig.colorbar(
+        c,
+        ax=ax,
+        label=bar_label,
+        format=ticker.FormatStrFormatter(f"%.{decimals}f"),
+    )
+    if filename is not None:
+        fig.savefig(filename)
+    else:
+        fig.savefig(title + ".png")
+    pl.close()
+
+
+@instrumentation.timed("plotContour.plotContour")
+def plotContour(
+    solutions,
+    x,
+    y,
+    barLabel,
+    xlabel,
+    ylabel,
+    title,
+    colormap="plasma",
+    levels=10,
+    filename=None,
+    decimals=1,
+):  # plot 2d solutions
+    from matplotlib.ticker import FormatStrFormatter
+
+    pl = _pyplot()
+
+    # plot it
+    fig = pl.figure()
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    levels = np.linspace(np.min(solutions), np.max(solutions), levels)
+    print(levels)
+    c = ax.contourf(x, y, solutions, levels, cmap=colormap)
+    cbar = fig.colorbar(c, ax=ax, label=barLabel)
+    cbar.ax.yaxis.set_major_formatter(FormatStrFormatter(f"%.{decimals}f"))
+    if filename is not None:
+        fig.savefig(filename)
+    else:
+        fig.savefig(title + ".png")
+    pl.close()
+
+
+@instrumentation.timed("plotContour.plotContourLog")
+def plotContourLog(
+    solutions,
+    x,
+    y,
+    barLabel,
+    xlabel,
+    ylabel,
+    title,
+    levels=None,
+    colormap="plasma",
+    filename=None,
+    decimals=1,
+):  # plot 2d solutions
+    from matplotlib import ticker
+    from matplotlib.colors import LogNorm
+
+    pl = _pyplot()
+
+    # plot it
+    fig = pl.figure(figsize=(5, 4))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    c = ax.contourf(
+        x, y, solutions, norm=LogNorm(), levels=levels, cmap=colormap
+    )
+    fig.colorbar(
+        c,
+        ax=ax,
+        label=barLabel,
+        format=ticker.FormatStrFormatter(f"%.{decimals}f"),
+    )
+    if filename is not None:
+        fig.savefig(filename + ".png")
+    else:
+        fig.savefig(title + ".png")
+    pl.close()
+
+
+@instrumentation.timed("plotContour.plotContourLinesLog")
+def plotContourLinesLog(
+    solutions, x, y, barLabel, xlabel, ylabel, title, decimals=1
+):
+    from matplotlib import ticker
+
+    pl = _pyplot()
+
+    # plot it
+    fig = pl.figure(figsize=(5, 4))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    c = ax.contourf(x, y, solutions, locator=ticker.LogLocator())
+    l = ax.contour(
+        x, y, solutions, colors="black", locator=ticker.LogLocator()
+    )
+    ax.clabel(l, l.levels, inline=True, fontsize=10, fmt=sciFormat)
+    fig.colorbar(
+        c,
+        ax=ax,
+        label=barLabel,
+        format=ticker.FormatStrFormatter(f"%.{decimals}f"),
+    )
+    fig.savefig(title + ".png")
+    pl.close()
+
+
+@instrumentation.timed("plotContour.plotContourLines")
+def plotContourLines(
+    solutions, x, y, barLabel, xlabel, ylabel, title, decimals
+):
+    from matplotlib import ticker
+
+    pl = _pyplot()
+
+    # plot it
+    fig = pl.figure(figsize=(5, 4))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    pl.title(title)
+    c = ax.contourf(x, y, solutions)
+    l = ax.contour(x, y, solutions, colors="black")
+    ax.clabel(l, l.levels, inline=True, fontsize=10, fmt=sciFormat)
+    fig.colorbar(
+        c,
+        ax=ax,
+        label=barLabel,
+        format=ticker.FormatStrFormatter(f"%.{decimals}f"),
+    )
+    fig.savefig(title + ".png")
+    pl.close()
+
+
+_CONTOUR_KINDS = ("tri", "tri_log", "grid", "grid_log")
+
+
+class ContourRenderer(object):
+    """
+    A single figure reused to draw many filled contour plots over the same
+    x and y, for when making and closing a figure per plot dominates. Each
+    render swaps out only the contour artists, the colorbar's mappable and
+    the title, and the layout is worked out on the first render only.
+
+    Arguments:
+        x, y (np arrays): coordinates shared by every plot, scattered points
+            for the tri kinds or a grid for the grid kinds
+        xlabel (str)
+        ylabel (str)
+        bar_label (str)
+        kind (str): "tri" and "tri_log" draw like plot_tri_contour and
+            plot_tri_contour_log, "grid" and "grid_log" like plotContour and
+            plotContourLog
+        colormap (str)
+        levels (int or array): contour levels, for "grid" an int is the
+            number of levels evenly spaced between each plot's min and max
+        limit_line (float): value to draw a labeled black contour line at,
+            None for no line
+        decimals (int): decimals on the colorbar labels
+        figsize (tuple of float)
+    """
+
+    def __init__(
+        self,
+        x,
+        y,
+        xlabel,
+        ylabel,
+        bar_label,
+        kind="tri",
+        colormap="plasma",
+        levels=None,
+        limit_line=None,
+        decimals=1,
+        figsize=(8, 6.4),
+    ):
+        if kind not in _CONTOUR_KINDS:
+            raise ValueError(f"kind must be one of {_CONTOUR_KINDS}")
+        self.kind = kind
+        self.colormap = colormap
+        self.levels = levels
+        self.limit_line = limit_line
+        self.bar_label = bar_label
+        self.decimals = decimals
+
+        _setup_matplotlib()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+
+        if kind.startswith("tri"):
+            self._coords = (get_triangulation(x, y),)
+            self._fill = self.ax.tricontourf
+            self._lines = self.ax.tricontour
+        else:
+            self._coords = (x, y)
+            self._fill = self.ax.contourf
+            self._lines = self.ax.contour
+
+        self._artists = []
+        self.colorbar = None
+
+    def _draw(self, solutions):
+        from matplotlib.colors import LogNorm
+
+        norm = LogNorm() if self.kind.endswith("_log") else None
+        levels = self.levels
+        if self.kind == "grid" and np.ndim(levels) == 0:
+            levels = np.linspace(
+                np.min(solutions), np.max(solutions), levels or 10
+            )
+
+        fill = self._fill(
+            *self._coords,
+            solutions,
+            levels=levels,
+            norm=norm,
+            cmap=self.colormap,
+        )
+        self._artists = [fill]
+        if self.limit_line is not None:
+            lines = self._lines(
+                *self._coords,
+                solutions,
+                colors="black",
+                levels=[self.limit_line],
+            )
+            self.ax.clabel(
+                lines, lines.levels, inline=True, fontsize=10, fmt=sciFormat
+            )
+            self._artists.append(lines)
+
+        return fill
+
+    def render(self, solutions, title, filename=None):
+        """
+        Draw solutions and save the figure.
+
+        Arguments:
+            solutions (np array): values at x, y
+            title (str)
+            filename (str): defaults to title + ".png"
+        """
+        from matplotlib.ticker import FormatStrFormatter
+
+        with instrumentation.timer("plotContour.ContourRenderer.draw"):
+            for artist in self._artists:
+                artist.remove()
+            fill = self._draw(solutions)
+            self.ax.set_title(title)
+
+            if self.colorbar is None:
+                cax = None
+                ax = self.ax
+            else:
+                # the colorbar keeps the contour levels it was made with, so
+                # it is redrawn into the same axes rather than updated
+                cax = self.colorbar.ax
+                cax.clear()
+                ax = None
+            self.colorbar = self.fig.colorbar(
+                fill,
+                cax=cax,
+                ax=ax,
+                label=self.bar_label,
+                format=FormatStrFormatter(f"%.{self.decimals}f"),
+            )
+
+        with instrumentation.timer("plotContour.ContourRenderer.save"):
+            self.fig.savefig(filename or title + ".png")
+        # keep the positions tight layout found on the first render
+        self.fig.set_layout_engine("none")
+
+
+def _render_batch(renderer_args, renderer_kwargs, jobs):
+    renderer = ContourRenderer(*renderer_args, **renderer_kwargs)
+    for solutions, title, filename in jobs:
+        renderer.render(solutions, title, filename)
+    return len(jobs)
+
+
+def render_contours(
+    solutions,
+    x,
+    y,
+    xlabel,
+    ylabel,
+    bar_label,
+    titles,
+    filenames=None,
+    workers=1,
+    **kwargs,
+):
+    """
+    Render many contour plots sharing the same x and y, each worker process
+    drawing its share on one reused ContourRenderer.
+
+    Arguments:
+        solutions (list of np arrays): values at x, y for each plot
+        x, y (np arrays): coordinates shared by every plot
+        xlabel (str)
+        ylabel (str)
+        bar_label (str)
+        titles (list of str): title of each plot
+        filenames (list of str): defaults to each title + ".png"
+        workers (int): number of processes to render with
+        **kwargs: passed on to ContourRenderer (kind, colormap, levels,
+            limit_line, decimals, figsize)
+
+    Returns:
+        plots_per_second (float): throughput of the whole batch
+    """
+    if filenames is None:
+        filenames = [None] * len(titles)
+    jobs = list(zip(solutions, titles, filenames))
+    renderer_args = (x, y, xlabel, ylabel, bar_label)
+
+    start = time.perf_counter()
+    if workers == 1:
+        _render_batch(renderer_args, kwargs, jobs)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(
+                    _render_batch, renderer_args, kwargs, jobs[i::workers]
+                )
+                for i in range(workers)
+            ]
+            for future in futures:
+                future.result()
+
+    return len(jobs) / (time.perf_counter() - start)
@@ -0,0 +1,155 @@
+import numpy as np
+import math
+import concurrent.futures
+
+#take 2 arrays of equal length name and dimension for each layer, make a nice picture
+
+def plotRadialBuild(build, phi_index, theta_index, Title = "Radial Build", colors = None, height = 20, textSpace = 10, size = (8,4)):
+    """
+    build: dict formatted as for parastell
+    phi_index, theta_index; angle pair for the index desired from the thickness matrix
+    title: string, title for plot and filename to save to
+    colors: list of matplotlib color strings. if specific colors are desired for each layer they can be added here
+    height: height to make the rectangles, float
+    textSpace: height avaliable for text, float
+    size: figure size, inches, tuple
+    """
+    import matplotlib.pyplot as plt
+
+    layers, thicknesses = _gridThicknesses(build, phi_index, theta_index)
+
+    plt.figure(1, figsize=size)
+    plt.tight_layout()
+    ax = plt.gca()
+    _drawRadialBuild(ax, layers, thicknesses, colors, height, textSpace)
+
+    plt.title(Title)
+    plt.savefig(Title + '.png')
+
+    plt.close()
+
+
+def _gridThicknesses(build, phi_index, theta_index):
+    layers = list(build['radial_build'].keys())
+    radial_build = build['radial_build']
+
+    thicknesses = []
+
+    for layer in layers:
+        thicknesses.append(radial_build[layer]['thickness_matrix'][phi_index][theta_index])
+
+    return layers, thicknesses
+
+
+def _drawRadialBuild(ax, layers, thicknesses, colors = None, height = 20, textSpace = 10):
+    """
+    draw the rectangles and labels of one radial build onto ax
+    """
+    import matplotlib.colors
+    from matplotlib.patches import Rectangle
+
+    #make a list of colors if none provided
+    if colors is None: 
+        colors = list(matplotlib.colors.XKCD_COLORS.values())[0:len(layers)]
+
+    #initialize list for lower left corner of each layer rectangle
+    ll = [0,0]
+
+    #embiggen layers too small for text
+    graphicsThicknesses = []
+
+    for i in range(len(thicknesses)):
+        if thicknesses[i] < 6:
+            graphicsThicknesses.append(6)
+        elif thicknesses[i] > 15:
+            graphicsThicknesses.append(thicknesses[i]/10+15)
+        else:
+            graphicsThicknesses.append(thicknesses[i]) 
+
+    ax.set_xlim(-1, sum(graphicsThicknesses)+1)
+    ax.set_ylim(-textSpace,height+1)
+    ax.set_axis_off()
+
+    for layer, thickness, graphicsThickness, color in zip(layers, thicknesses, graphicsThicknesses, colors):
+        
+        #put the rectangle
+        ax.add_patch(Rectangle(ll,graphicsThickness, height, facecolor = color, edgecolor = "black"))
+        
+        #put the text in
+        centerx = (ll[0]+ll[0]+graphicsThickness)/2+1
+        centery = (height+1)/2
+        ax.text(centerx, centery, layer + " " + str(thickness) + " cm", rotation = "vertical", ha = "center", va = "center")
+
+        #update lower left corner
+        ll[0] = ll[0]+float(graphicsThickness)
+
+
+def _plotRadialBuildBatch(build, jobs, colors, height, textSpace, size):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    #one figure per worker, cleared between plots rather than recreated
+    fig = Figure(figsize=size)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+
+    for phi_index, theta_index, title in jobs:
+        ax.clear()
+        layers, thicknesses = _gridThicknesses(build, phi_index, theta_index)
+        _drawRadialBuild(ax, layers, thicknesses, colors, height, textSpace)
+        ax.set_title(title)
+        fig.savefig(title + '.png')
+
+    return len(jobs)
+
+
+def batchPlotRadialBuild(build, indices = None, Title = "Radial Build", colors = None, height = 20, textSpace = 10, size = (8,4), workers = 1):
+    """
+    plotRadialBuild for many grid nodes of a build at once, spread over
+    worker processes that each reuse a single figure
+
+    build: dict formatted as for parastell
+    indices: list of (phi_index, theta_index) pairs, defaults to every node
+        of the thickness matrices
+    Title: string, each plot is titled and saved as
+        "Title phi <phi> theta <theta>"
+    colors, height, textSpace, size: as for plotRadialBuild
+    workers: number of processes to render with
+
+    returns: list of the filenames written
+    """
+    if indices is None:
+        indices = [(phi_index, theta_index)
+            for phi_index in range(len(build['phi_list']))
+            for theta_index in range(len(build['theta_list']))]
+
+    jobs = [(phi_index, theta_index,
+        f"{Title} phi {build['phi_list'][phi_index]} theta {build['theta_list'][theta_index]}")
+        for phi_index, theta_index in indices]
+
+    if workers == 1:
+        _plotRadialBuildBatch(build, jobs, colors, height, textSpace, size)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(_plotRadialBuildBatch, build, jobs[i::workers], colors, height, textSpace, size)
+                for i in range(workers)]
+            for future in futures:
+                future.result()
+
+    return [job[2] + '.png' for job in jobs]
+
+
+def main():
+
+    #examples
+    layers = ["SOL", "Armor","FW","Breeder","BW","Manifolds","Hight Temp Shield","Gap 1","Vacuum Vessel","Low Temp Shield", "Gap 2", "Coil Case", "Winding Pack", "Coil Case"]
+    thicknesses = [5, 0.2, 4, 30, 4, 15, 20, 2, 31, 18, 2, 5, 10, 5]
+    build = {layers[i]: thicknesses[i] for i in range(len(layers))}
+
+    #default settings
+    radialBuild(build, Title="Radial Build (As Discussed)")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import numpy as np
+from .centroids_to_theta_phi import normal_offsets
+
+
+def _cardinal_splines(grid, periodic):
+    """
+    Spline through each unit vector on the grid, so evaluating it gives the
+    weight of every grid value at the evaluation points. For a periodic
+    grid the last node is the first one again and gets no weight of its own.
+    """
+    from scipy.interpolate import CubicSpline
+
+    num_nodes = len(grid) - 1 if periodic else len(grid)
+    unit = np.eye(num_nodes)
+    if periodic:
+        unit = np.vstack([unit, unit[:1]])
+        return CubicSpline(grid, unit, bc_type="periodic")
+    return CubicSpline(grid, unit)
+
+
+class ThicknessInterpolator(object):
+    """
+    Cubic spline interpolation of the thickness matrices of every layer of a
+    parastell style radial build, vectorized over both points and layers.
+
+    The spline is periodic in theta, which must span 360 degrees with the
+    first and last columns equal. It is periodic in phi over the span of
+    phi_list when the first and last rows of every layer are equal, as for
+    a build covering one field period. Otherwise it uses not-a-knot end
+    conditions in phi and refuses to extrapolate, raising ValueError for
+    any phi outside phi_list.
+
+    Arguments:
+        build (dict): radial build formatted as for parastell, with phi_list,
+            theta_list in degrees and a thickness_matrix for each layer of
+            radial_build
+
+    Attributes:
+        layers (list of str): layer names, in the order of the columns
+            returned
+    """
+
+    # points evaluated at a time, bounds the size of the weight arrays
+    chunk_size = 100000
+
+    def __init__(self, build):
+        self.phi_list = np.asarray(build["phi_list"], dtype=float)
+        self.theta_list = np.asarray(build["theta_list"], dtype=float)
+        self.layers = list(build["radial_build"].keys())
+
+        # layers X phi X theta
+        thicknesses = np.array(
+            [
+                build["radial_build"][layer]["thickness_matrix"]
+                for layer in self.layers
+            ],
+            dtype=float,
+        )
+        if thicknesses.shape[1:] != (len(self.phi_list), len(self.theta_list)):
+            raise ValueError(
+                "thickness matrices must be len(phi_list) X len(theta_list)"
+            )
+        if self.theta_list[-1] - self.theta_list[0] != 360:
+            raise ValueError("theta_list must span 360 degrees")
+        if not np.allclose(thicknesses[:, :, 0], thicknesses[:, :, -1]):
+            raise ValueError(
+                "thicknesses at the first and last theta must be equal"
+            )
+
+        self.periodic_phi = np.allclose(
+            thicknesses[:, 0, :], thicknesses[:, -1, :]
+        )
+        self._phi_weights = _cardinal_splines(self.phi_list, self.periodic_phi)
+        self._theta_weights = _cardinal_splines(self.theta_list, True)
+        if self.periodic_phi:
+            thicknesses = thicknesses[:, :-1, :]
+        self._thicknesses = thicknesses[:, :, :-1]
+
+    def __call__(self, phis, thetas):
+        """
+        Evaluate the thickness of every layer at each point.
+
+        Arguments:
+            phis (np array): toroidal angles in degrees
+            thetas (np array): poloidal angles in degrees, same shape as phis
+
+        Returns:
+            thicknesses (np array): shape of phis X number of layers, in the
+                units of the thickness matrices
+        """
+        phis, thetas = np.broadcast_arrays(
+            np.asarray(phis, dtype=float), np.asarray(thetas, dtype=float)
+        )
+        shape = phis.shape
+        phis = phis.ravel()
+        thetas = thetas.ravel()
+
+        theta0 = self.theta_list[0]
+        thetas = theta0 + np.mod(thetas - theta0, 360)
+        if self.periodic_phi:
+            phi0 = self.phi_list[0]
+            period = self.phi_list[-1] - phi0
+            phis = phi0 + np.mod(phis - phi0, period)
+        elif len(phis) > 0 and (
+            phis.min() < self.phi_list[0] or phis.max() > self.phi_list[-1]
+        ):
+            raise ValueError(
+                f"phi from {phis.min()} to {phis.max()} is outside the "
+                f"build's phi_list, {self.phi_list[0]} to "
+                f"{self.phi_list[-1]}, and the build isn't periodic in phi"
+            )
+
+        out = np.empty((len(phis), len(self.layers)))
+        for start in range(0, len(phis), self.chunk_size):
+            stop = start + self.chunk_size
+            out[start:stop] = np.einsum(
+                "mi,lij,mj->ml",
+                self._phi_weights(phis[start:stop]),
+                self._thicknesses,
+                self._theta_weights(thetas[start:stop]),
+                optimize=True,
+            )
+
+        return out.reshape(shape + (len(self.layers),))
+
+
+def classify_elements(
+    centroids,
+    phi_coords,
+    theta_coords,
+    build,
+    vmec=None,
+    offsets=None,
+    interpolator=None,
+):
+    """
+    Find the radial build layer each mesh element is in, from where its
+    centroid sits along the surface normal at its phi, theta. Layers are
+    stacked outward from the surface at build["wall_s"] in the order of
+    build["radial_build"], with thicknesses interpolated to each element by
+    ThicknessInterpolator.
+
+    Arguments:
+        centroids (np array of x,y,z): element centroids in cm
+        phi_coords (1D np array): phi of each centroid in degrees, as from
+            centroids_to_theta_phi. Must be within phi_list unless the
+            build is periodic in phi, see ThicknessInterpolator.
+        theta_coords (1D np array): theta of each centroid in degrees
+        build (dict): radial build formatted as for parastell
+        vmec (read_vmec object or VMECSurface): plasma equilibrium, only
+            needed if offsets isn't given
+        offsets (1D np array): distance of each centroid from the surface
+            along its normal in cm, see normal_offsets. Computed from the
+            centroids if not given.
+        interpolator (ThicknessInterpolator): of build, if already made
+
+    Returns:
+        layer_ids (1D np array of int): index into
+            list(build["radial_build"]) of each element's layer, -1 for
+            elements inside the surface or outside the last layer
+    """
+    if interpolator is None:
+        interpolator = ThicknessInterpolator(build)
+    if offsets is None:
+        if vmec is None:
+            raise ValueError("vmec is needed to compute the offsets")
+        offsets = normal_offsets(
+            centroids, phi_coords, theta_coords, build["wall_s"], vmec
+        )
+    offsets = np.asarray(offsets, dtype=float)
+
+    outer_surfaces = np.cumsum(interpolator(phi_coords, theta_coords), axis=1)
+    # number of layers whose outer surface the element is past
+    layer_ids = np.count_nonzero(
+        outer_surfaces <= offsets[:, np.newaxis], axis=1
+    )
+    layer_ids[(offsets < 0) | (layer_ids == len(interpolator.layers))] = -1
+
+    return layer_ids
+
+
+def sum_by_layer(layer_ids, values, num_layers):
+    """
+    Total values, such as calcHeating or calcDPAIron results times element
+    volumes, over the elements of each layer. Elements with a layer id of
+    -1 are left out.
+
+    Arguments:
+        layer_ids (1D np array of int): from classify_elements
+        values (1D np array): value for each element
+        num_layers (int): number of layers in the build
+
+    Returns:
+        totals (1D np array): one per layer
+    """
+    inside = layer_ids >= 0
+    return np.bincount(
+        layer_ids[inside], weights=values[inside], minlength=num_layers
+    )
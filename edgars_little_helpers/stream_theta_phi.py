@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import warnings
+import h5py
+import numpy as np
+from .centroids_to_theta_phi import centroids_to_theta_phi
+from .h5m_mesh import count_tets, iter_tet_centroids
+from .vmec_surface import as_surface
+
+# written on the output file, a mismatch means it belongs to a different run
+_RUN_ATTRS = ("mesh_path", "wall_s", "num_elements", "run_hash")
+
+
+def _run_hash(surface, num_theta_guesses, max_iter, guess_table):
+    """
+    Return a sha256 of the surface coefficients and the solver settings,
+    which decide the results as much as the mesh and wall_s do.
+    """
+    sha = hashlib.sha256()
+    for coefficients in (surface.xm, surface.xn, surface.rmnc, surface.zmns):
+        sha.update(np.ascontiguousarray(coefficients, dtype=float).tobytes())
+
+    settings = {
+        "num_theta_guesses": int(num_theta_guesses),
+        "max_iter": int(max_iter),
+        "guess_table": None,
+    }
+    if guess_table is not None:
+        settings["guess_table"] = [
+            len(guess_table.theta_grid),
+            len(guess_table.phi_grid),
+        ]
+    sha.update(json.dumps(settings, sort_keys=True).encode())
+
+    return sha.hexdigest()
+
+
+def _open_output(output_path, mesh_path, wall_s, num_elements, run_hash):
+    """
+    Open or create the output file and return it with the number of
+    elements already completed.
+    """
+    run = {
+        "mesh_path": os.path.abspath(mesh_path),
+        "wall_s": wall_s,
+        "num_elements": num_elements,
+        "run_hash": run_hash,
+    }
+    if os.path.exists(output_path):
+        output = h5py.File(output_path, "a")
+        for key in _RUN_ATTRS:
+            written = output.attrs.get(key)
+            if written != run[key]:
+                output.close()
+                raise ValueError(
+                    f"{output_path} was written for {key}={written}, "
+                    f"not {run[key]}"
+                )
+        return output, int(output.attrs["completed"])
+
+    output = h5py.File(output_path, "w")
+    for key in _RUN_ATTRS:
+        output.attrs[key] = run[key]
+    output.attrs["completed"] = 0
+    output.create_dataset("phi", (num_elements,), dtype=np.float64)
+    output.create_dataset("theta", (num_elements,), dtype=np.float64)
+    output.create_dataset("iterations", (num_elements,), dtype=np.int64)
+    output.create_dataset("converged", (num_elements,), dtype=bool)
+
+    return output, 0
+
+
+def stream_centroids_to_theta_phi(
+    mesh_path,
+    output_path,
+    wall_s,
+    vmec,
+    num_theta_guesses,
+    max_iter,
+    block_size=100000,
+    guess_table=None,
+):
+    """
+    Run centroids_to_theta_phi over every tet of an h5m mesh a block at a
+    time, writing the results to an HDF5 file as each block finishes.
+
+    The output file records how many elements are complete after every
+    block, so if a run is interrupted calling this again with the same
+    arguments picks up from the last finished block. An output file written
+    for a different mesh, surface or solver settings raises a ValueError
+    instead. Memory use is set by block_size rather than by the size of the
+    mesh.
+
+    Arguments:
+        mesh_path (str): path to h5m mesh, such as the output of makeUmesh
+        output_path (str): HDF5 file to write phi, theta, iterations and
+            converged datasets to, in element order. Angles are in degrees.
+        wall_s (float): vmec parameter for the surface of interest
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+        num_theta_guesses (int): number of evenly spaced theta points to check
+            to determine the starting point for rootfinding
+        max_iter (int): maximum iterations before declaring that the root
+            has failed to converge.
+        block_size (int): number of elements read and solved at a time
+        guess_table (SurfaceLookupTable): optional source of initial guesses
+
+    Returns:
+        num_failed (int): number of elements that failed to converge
+    """
+    surface = as_surface(vmec, wall_s)
+    num_elements = count_tets(mesh_path)
+
+    run_hash = _run_hash(surface, num_theta_guesses, max_iter, guess_table)
+    output, completed = _open_output(
+        output_path, mesh_path, wall_s, num_elements, run_hash
+    )
+    with output:
+        for start, centroids in iter_tet_centroids(
+            mesh_path, block_size, start=completed
+        ):
+            stop = start + len(centroids)
+
+            with warnings.catch_warnings():
+                # failures are counted from the output once all blocks finish
+                warnings.simplefilter("ignore", RuntimeWarning)
+                phi_coords, theta_coords, iterations, converged = (
+                    centroids_to_theta_phi(
+                        centroids,
+                        wall_s,
+                        surface,
+                        num_theta_guesses,
+                        max_iter,
+                        full_output=True,
+                        guess_table=guess_table,
+                    )
+                )
+
+            output["phi"][start:stop] = phi_coords
+            output["theta"][start:stop] = theta_coords
+            output["iterations"][start:stop] = iterations
+            output["converged"][start:stop] = converged
+            output.flush()
+
+            # only mark the block complete once its results are on disk
+            output.attrs["completed"] = stop
+            output.flush()
+
+        num_failed = 0
+        for start in range(0, num_elements, block_size):
+            num_failed += np.count_nonzero(
+                ~output["converged"][start : start + block_size]
+            )
+
+    if num_failed:
+        warnings.warn(
+            f"{num_failed} of {num_elements} elements failed to converge "
+            f"after {max_iter} iterations",
+            RuntimeWarning,
+        )
+
+    return num_failed
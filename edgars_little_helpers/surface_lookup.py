@@ -0,0 +1,111 @@
+import numpy as np
+from .vmec_surface import VMECSurface, as_surface
+
+
+class SurfaceLookupTable(object):
+    """
+    Dense (theta, phi) sampling of the surface at wall_s stored in a KD-tree,
+    for bulk nearest-theta queries.
+
+    Build it once per equilibrium and wall_s, then pass it to
+    centroids_to_theta_phi as guess_table to replace the brute force theta
+    scan of get_theta_guesses. It can be saved to and loaded from an .npz
+    file so later runs don't need to resample the surface, or even reread
+    the vmec file.
+
+    Arguments:
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+        wall_s (float): vmec parameter for the surface of interest
+        num_theta (int): number of evenly spaced poloidal samples
+        num_phi (int): number of evenly spaced toroidal samples over the full
+            torus
+    """
+
+    def __init__(self, vmec, wall_s, num_theta=720, num_phi=720):
+        self.surface = as_surface(vmec, wall_s)
+        self.wall_s = wall_s
+        self.theta_grid = np.linspace(0, 2 * np.pi, num_theta, endpoint=False)
+        self.phi_grid = np.linspace(-np.pi, np.pi, num_phi, endpoint=False)
+
+        r, z = self.surface.rz_grid(self.theta_grid, self.phi_grid)
+        points = np.stack(
+            (
+                r * np.cos(self.phi_grid)[:, np.newaxis],
+                r * np.sin(self.phi_grid)[:, np.newaxis],
+                z,
+            ),
+            axis=-1,
+        )
+        self._build_tree(points.reshape(-1, 3))
+
+    def _build_tree(self, points):
+        self.points = points
+        from scipy.spatial import cKDTree
+
+        self.tree = cKDTree(points)
+
+    def query(self, coords, workers=-1):
+        """
+        Return the theta of the nearest surface sample to each coordinate.
+
+        Arguments:
+            coords (numpy array of XYZ): points to find thetas for
+            workers (int): threads used by the KD-tree, -1 for all cores
+
+        Returns:
+            thetas (1D np array): theta of the nearest sample in radians
+            distances (1D np array): distance to the nearest sample
+        """
+        distances, indices = self.tree.query(coords, workers=workers)
+        thetas = self.theta_grid[indices % len(self.theta_grid)]
+
+        return thetas, distances
+
+    def save(self, path):
+        """
+        Write the table and the surface coefficients to an .npz file
+
+        Arguments:
+            path (str): file to write to
+        """
+        np.savez(
+            path,
+            wall_s=self.wall_s,
+            scale=self.surface.scale,
+            xm=self.surface.xm,
+            xn=self.surface.xn,
+            rmnc=self.surface.rmnc,
+            zmns=self.surface.zmns,
+            theta_grid=self.theta_grid,
+            phi_grid=self.phi_grid,
+            points=self.points,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a table written by save. The KD-tree is rebuilt from the stored
+        samples, which is much cheaper than resampling the surface.
+
+        Arguments:
+            path (str): .npz file written by save
+
+        Returns:
+            table (SurfaceLookupTable)
+        """
+        with np.load(path) as data:
+            table = cls.__new__(cls)
+            table.wall_s = float(data["wall_s"])
+            table.surface = VMECSurface.from_coefficients(
+                data["xm"],
+                data["xn"],
+                data["rmnc"],
+                data["zmns"],
+                table.wall_s,
+                float(data["scale"]),
+            )
+            table.theta_grid = data["theta_grid"]
+            table.phi_grid = data["phi_grid"]
+            table._build_tree(data["points"])
+
+        return table
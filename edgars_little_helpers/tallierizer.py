@@ -0,0 +1,451 @@
+import hashlib
+import json
+import h5py
+import numpy as np
+from . import instrumentation
+
+def calcDPAIron(power, material, volumes, dpaTally, mean = None, stddev = None, dtype = np.float64, registry = None):
+	"""
+	Input:
+	dpaTally: Cell tally object with iron nuclide filter scoring damage energy eV/source
+	power: float, power of source Watts
+	material: material object where tally is scored, or anything else
+		ironDensity takes (a material name if registry is given)
+	volume: volume where tally is scored cm3
+	if mean is given (mesh tally), dpaTally is still used for its nuclides:
+	mean: mean damage energy at each mesh element (binned by nuclide)
+	stdev: stdev of the same
+	volumes: volume of each mesh element
+	dtype: float type to reduce and return the mesh results in, np.float32 halves memory
+	registry: getMaterial.MaterialRegistry to look material up in by name
+	
+	returns:
+	if mean not given:
+	DPAmean: sum of displacements per atom per fpy across all nuclides specified in filter
+	DPAstddev: stdev of same
+	else
+	DPAmean: array of sum of DPA per FPY across all nuclides at each mesh element
+	DPAstddev: stdev of same
+
+	standard deviations of the nuclide bins are summed in quadrature
+	"""
+    
+	displacementsPerEnergy = damageEnergyToDPA(power)
+	FeDensity = ironDensity(material, dpaTally.nuclides, registry)
+		
+	if mean is None:
+
+		#damage energy stats
+		damageEnergy = dpaTally.mean.sum() #eV/source
+		stDev = np.sqrt(np.square(dpaTally.std_dev).sum())
+
+		#mean DPA
+		numFe = FeDensity*volumes
+		DPAmean = damageEnergy*displacementsPerEnergy/numFe
+
+		#std dev DPA
+		DPAstDev = stDev*displacementsPerEnergy/numFe
+
+		return DPAmean, DPAstDev
+		
+	else:
+		return meshDPA(mean[:,:,0], stddev[:,:,0], FeDensity, volumes, power, dtype)
+
+def damageEnergyToDPA(power):
+	"""
+	power: power of source Watts
+
+	returns:
+	factor converting damage energy (eV/source) in iron to displacements per FPY
+	"""
+	#calculate DPA per FPY based on the following constants
+	Ed = 40 #eV, displacement energy in iron
+	displacementEfficiency = 0.8
+	energyPerFusion = 17.6e6 #eV
+	eVtoJ = 1.60218e-19 #J/eV
+	sourceNeutronsPerYear = power/(energyPerFusion*eVtoJ)*60*60*24*365.25
+
+	return displacementEfficiency/(2*Ed)*sourceNeutronsPerYear
+
+def ironDensity(material, nuclides, registry = None):
+	"""
+	material: material object where tally is scored, the dict returned by
+		its get_nuclide_atom_densities(), an array of atom densities
+		(atoms/b-cm) in the order of nuclides, or the name of a material in
+		registry
+	nuclides: names of the nuclides to count
+	registry: getMaterial.MaterialRegistry, its cached density arrays are
+		used instead of building the density dict
+
+	returns:
+	atom density of the given nuclides in atoms/cm3
+	"""
+	if registry is not None:
+		return registry.nuclideDensity(material, nuclides)
+	if isinstance(material, np.ndarray):
+		if len(material) != len(nuclides):
+			raise ValueError(f'{len(material)} atom densities do not match {len(nuclides)} nuclides')
+		return material.sum()/(1e-24)
+	#only build the density dict once
+	if isinstance(material, dict):
+		atomDensities = material
+	else:
+		atomDensities = material.get_nuclide_atom_densities()
+	FeDensity = sum(atomDensities[i] for i in nuclides)
+	return FeDensity/(1e-24) #to atoms/cm3
+
+@instrumentation.timed('tallierizer.meshDPA')
+def meshDPA(mean, stdDev, FeDensity, volumes, power, dtype = np.float64):
+	"""
+	mean: damage energy (eV/source), elements X nuclides
+	stdDev: stdev of the same
+	FeDensity: atom density of the nuclides, atoms/cm3 (see ironDensity)
+	volumes: volume of each element cm3
+	power: float, power of source Watts
+	dtype: float type to reduce and return in
+
+	returns:
+	DPAmean: array of sum of DPA per FPY across all nuclides at each element
+	DPAstddev: stdev of same, nuclides summed in quadrature
+	"""
+	#damage energy stats, reduced over the nuclide axis in one pass
+	damageEnergy = mean.sum(axis=1, dtype=dtype)
+	stdDevDamage = np.sqrt(np.einsum('ij,ij->i', stdDev, stdDev, dtype=dtype, casting='same_kind'))
+		
+	#mean DPA
+	scale = np.dtype(dtype).type(damageEnergyToDPA(power)/FeDensity)/np.asarray(volumes, dtype=dtype)
+	DPAmean = damageEnergy*scale
+	
+	#std dev DPA
+	DPAstDev = stdDevDamage*scale
+	
+	return DPAmean, DPAstDev
+
+@instrumentation.timed('tallierizer.calcHeating')
+def calcHeating(heatingMean, heatingStddev, power, volumes = None):
+	"""
+	heatingTally: openmcTally with 'heating' scored (ev/source)
+	power: power of device, watts
+	volume: array of volumes to normalize heating to (mesh.volume)
+	
+	returns:
+	heatingMean heatingStddev: 1xN arrays, units W/cm3 if vol is not none
+	heatingMean heatingStddev: float, units of W if vol is none
+	"""
+	
+	#convert units
+	heatingMean = heatingMean*heatingToWatts(power) #w
+	heatingStddev = heatingStddev*heatingToWatts(power) #w
+
+	if volumes is not None:
+		
+		#only copies for multi dimensional (regular mesh) volumes
+		volumes = np.ravel(volumes.T)
+
+		heatingMean = np.divide(heatingMean, volumes) #w/cm3
+		heatingStddev = np.divide(heatingStddev, volumes) #w/cm3
+		
+	return heatingMean, heatingStddev
+
+def heatingToWatts(power):
+	"""
+	power: power of device, watts
+
+	returns:
+	factor converting heating (eV/source) to W
+	"""
+	#some constants
+	energyPerFusion = 17.6e6 #eV
+	eVtoJ = 1.60218e-19 #J/eV
+	neutronsPerSecond = power/(energyPerFusion*eVtoJ)
+
+	return neutronsPerSecond*eVtoJ
+
+class NormalizationContext:
+	"""
+	Everything needed to normalize tallies that is fixed for a campaign:
+	flattened mesh volumes, atom counts per element for each material and
+	the power dependent unit conversions. Each is computed the first time
+	it is needed and reused by every tally after that, instead of every
+	calcHeating/calcDPAIron call rebuilding mesh sized arrays.
+
+	power: power of device, watts
+	volumes: volume of each mesh element (mesh.volume), flattened the way
+		calcHeating does
+	materials: dict of name -> material object or atom density dict, or a
+		getMaterial.MaterialRegistry, whose cached density arrays are then
+		used for atomCounts
+	"""
+
+	def __init__(self, power, volumes, materials = None):
+		self.power = power
+		self.volumes = np.ascontiguousarray(_flatVolumes(volumes), dtype=np.float64)
+		self.volumes.flags.writeable = False
+		self.densities = {}
+		self.registry = materials if hasattr(materials, 'densityArray') else None
+		for name, material in (materials or {}).items():
+			if self.registry is not None:
+				self.densities[name] = dict(materials.atomDensities(name))
+			elif isinstance(material, dict):
+				self.densities[name] = dict(material)
+			else:
+				self.densities[name] = dict(material.get_nuclide_atom_densities())
+
+		self.heatingToWatts = heatingToWatts(power)
+		self.damageEnergyToDPA = damageEnergyToDPA(power)
+		self._cache = {}
+
+	@property
+	def key(self):
+		"""
+		hash identifying the power, volumes and material densities, for
+		telling whether a saved context matches the current campaign
+		"""
+		sha = hashlib.sha256()
+		sha.update(repr(float(self.power)).encode())
+		sha.update(self.volumes.tobytes())
+		sha.update(json.dumps(self.densities, sort_keys=True).encode())
+		return sha.hexdigest()
+
+	def _cached(self, key, build):
+		if key not in self._cache:
+			array = build()
+			array.flags.writeable = False
+			self._cache[key] = array
+		return self._cache[key]
+
+	def atomCounts(self, material, nuclides):
+		"""
+		material: name of a material in the context, or an array of atom
+			densities (atoms/b-cm) in the order of nuclides
+		nuclides: names of the nuclides to count
+
+		returns:
+		number of atoms of the nuclides in each element, read only
+		"""
+		if isinstance(material, np.ndarray):
+			#arrays can't be cache keys, only names are cached
+			atomCounts = ironDensity(material, nuclides)*self.volumes
+			atomCounts.flags.writeable = False
+			return atomCounts
+		if self.registry is not None:
+			build = lambda: ironDensity(material, nuclides, self.registry)*self.volumes
+		else:
+			build = lambda: ironDensity(self.densities[material], nuclides)*self.volumes
+		return self._cached(('atoms', material, tuple(nuclides)), build)
+
+	@instrumentation.timed('tallierizer.NormalizationContext.heating')
+	def heating(self, heatingMean, heatingStddev, dtype = np.float64):
+		"""
+		same as calcHeating with the context's power and volumes
+
+		returns:
+		heatingMean heatingStddev: W/cm3 in each element
+		"""
+		scale = self._cached(('heating', np.dtype(dtype).str),
+			lambda: (self.heatingToWatts/self.volumes).astype(dtype))
+		return heatingMean*scale, heatingStddev*scale
+
+	@instrumentation.timed('tallierizer.NormalizationContext.meshDPA')
+	def meshDPA(self, material, nuclides, mean, stdDev, dtype = np.float64):
+		"""
+		same as meshDPA for a material in the context
+
+		mean: damage energy (eV/source), elements X nuclides
+		stdDev: stdev of the same
+
+		returns:
+		DPAmean DPAstddev: DPA per FPY in each element
+		"""
+		scale = self._cached(('dpa', material, tuple(nuclides), np.dtype(dtype).str),
+			lambda: (self.damageEnergyToDPA/self.atomCounts(material, nuclides)).astype(dtype))
+		damageEnergy = mean.sum(axis=1, dtype=dtype)
+		stdDevDamage = np.sqrt(np.einsum('ij,ij->i', stdDev, stdDev, dtype=dtype, casting='same_kind'))
+		return damageEnergy*scale, stdDevDamage*scale
+
+	def save(self, path):
+		"""
+		write the context, including anything already cached, to an .npz file
+		"""
+		arrays = {f'cache{i}': value for i, value in enumerate(self._cache.values())}
+		np.savez(path, power=self.power, volumes=self.volumes,
+			densities=json.dumps(self.densities),
+			cacheKeys=json.dumps(list(self._cache.keys())), **arrays)
+
+	@classmethod
+	def load(cls, path):
+		"""
+		read a context written by save
+
+		returns:
+		NormalizationContext
+		"""
+		with np.load(path) as data:
+			context = cls(float(data['power']), data['volumes'], json.loads(str(data['densities'])))
+			for i, key in enumerate(json.loads(str(data['cacheKeys']))):
+				key = tuple(tuple(part) if isinstance(part, list) else part for part in key)
+				array = data[f'cache{i}']
+				array.flags.writeable = False
+				context._cache[key] = array
+		return context
+
+def _tallyInfo(statepoint, tallyId):
+	"""
+	statepoint: path to openmc statepoint h5 file
+	tallyId: id of the tally to read
+
+	returns:
+	nRows: number of filter bins of the tally
+	nuclides: names of its nuclide bins, in results order
+	"""
+	with h5py.File(statepoint, 'r') as f:
+		group = f[f'tallies/tally {tallyId}']
+		nuclides = [i.decode() for i in group['nuclides'][()]]
+		return group['results'].shape[0], nuclides
+
+def _iterTallyChunks(statepoint, tallyId, score, chunkSize):
+	"""
+	Read the results of one tally in a statepoint file a block of filter bins
+	at a time, without loading the whole results dataset. See _tallyInfo for
+	the number of filter bins and the nuclide names.
+
+	statepoint: path to openmc statepoint h5 file
+	tallyId: id of the tally to read
+	score: name of the score to keep
+	chunkSize: number of filter bins per block
+
+	yields:
+	start, mean, stdDev: first filter bin of the block, mean and stdev of
+		the score (filter bins X nuclides)
+	"""
+	with h5py.File(statepoint, 'r') as f:
+		group = f[f'tallies/tally {tallyId}']
+		results = group['results']
+		n = group['n_realizations'][()]
+		nuclides = group['nuclides'].shape[0]
+		scores = [i.decode() for i in group['score_bins'][()]]
+		scoreIndex = scores.index(score)
+
+		for start in range(0, results.shape[0], chunkSize):
+			with instrumentation.timer('tallierizer.read'):
+				#results columns are nuclide major, then score
+				block = results[start:start+chunkSize].reshape(-1, nuclides, len(scores), 2)
+				total = block[:,:,scoreIndex,0]
+				totalSq = block[:,:,scoreIndex,1]
+				mean = total/n
+				stdDev = np.sqrt(np.maximum(totalSq/n - mean**2, 0)/(n - 1))
+			instrumentation.count('tallierizer.bins_read', len(mean))
+			yield start, mean, stdDev
+
+def _flatVolumes(volumes):
+	"""
+	volumes flattened into tally order, the way calcHeating does, so a
+	regular mesh's volume array lines up with its filter bins
+	"""
+	return np.ravel(np.asarray(volumes).T)
+
+def _volumesFor(volumes, nRows, start, stop):
+	"""
+	volumes in tally order, one per filter bin or one per mesh element when
+	the mesh filter is the first filter (each element's bins are contiguous)
+	"""
+	if len(volumes) == nRows:
+		return volumes[start:stop]
+	if nRows % len(volumes) != 0:
+		raise ValueError(f'{len(volumes)} volumes do not match {nRows} filter bins')
+	return volumes[np.arange(start, stop)//(nRows//len(volumes))]
+
+def _createOutput(outPath, nRows, dtype, units, statepoint, tallyId):
+	out = h5py.File(outPath, 'w')
+	out.attrs['units'] = units
+	out.attrs['statepoint'] = statepoint
+	out.attrs['tally_id'] = tallyId
+	out.create_dataset('mean', (nRows,), dtype=dtype)
+	out.create_dataset('std_dev', (nRows,), dtype=dtype)
+	return out
+
+def _nuclideColumns(tallyNuclides, nuclides):
+	"""
+	columns of the nuclide bins to sum: those of nuclides if given, else
+	the 'total' bin if the tally has one (the other bins are already in it),
+	else every bin
+	"""
+	if nuclides is not None:
+		missing = [i for i in nuclides if i not in tallyNuclides]
+		if missing:
+			raise ValueError(f'nuclides {missing} are not in the tally, which has {tallyNuclides}')
+		return [tallyNuclides.index(i) for i in nuclides]
+	if 'total' in tallyNuclides:
+		return [tallyNuclides.index('total')]
+	return slice(None)
+
+def streamHeating(statepoint, tallyId, power, outPath, volumes = None, chunkSize = 1000000, dtype = np.float64, nuclides = None):
+	"""
+	Heating from a statepoint tally without loading the tally into memory.
+	Results are read chunkSize filter bins at a time, put through
+	calcHeating and written to outPath, so peak memory is set by chunkSize.
+
+	statepoint: path to openmc statepoint h5 file
+	tallyId: id of a tally with 'heating' scored (ev/source)
+	power: power of device, watts
+	outPath: h5 file to write 'mean' and 'std_dev' datasets to, one entry per filter bin
+	volumes: array of volumes to normalize heating to (mesh.volume), per mesh
+		element or per filter bin. Mesh elements must be the first filter.
+	chunkSize: number of filter bins per chunk
+	dtype: float type of the output
+	nuclides: names of the nuclide bins to sum, by default the 'total' bin
+		if the tally has one, otherwise all of them
+
+	heating of the nuclide bins is summed (stdev in quadrature), units are
+	W/cm3 if volumes is given, W otherwise
+	"""
+	if volumes is not None:
+		volumes = _flatVolumes(volumes)
+
+	nRows, tallyNuclides = _tallyInfo(statepoint, tallyId)
+	columns = _nuclideColumns(tallyNuclides, nuclides)
+	units = 'W/cm3' if volumes is not None else 'W'
+
+	with _createOutput(outPath, nRows, dtype, units, statepoint, tallyId) as out:
+		for start, mean, stdDev in _iterTallyChunks(statepoint, tallyId, 'heating', chunkSize):
+			mean = mean[:, columns]
+			stdDev = stdDev[:, columns]
+			stop = start + len(mean)
+			chunkVolumes = None
+			if volumes is not None:
+				chunkVolumes = _volumesFor(volumes, nRows, start, stop)
+			heatingMean, heatingStddev = calcHeating(
+				mean.sum(axis=1), np.sqrt(np.square(stdDev).sum(axis=1)), power, chunkVolumes)
+			out['mean'][start:stop] = heatingMean
+			out['std_dev'][start:stop] = heatingStddev
+
+def streamDPAIron(statepoint, tallyId, power, material, volumes, outPath, chunkSize = 1000000, dtype = np.float64, registry = None):
+	"""
+	DPA per FPY from a statepoint mesh tally without loading the tally into
+	memory. Results are read chunkSize filter bins at a time, put through
+	meshDPA and written to outPath, so peak memory is set by chunkSize.
+
+	statepoint: path to openmc statepoint h5 file
+	tallyId: id of a tally with iron nuclides scoring 'damage-energy' eV/source
+	power: float, power of source Watts
+	material: material object where tally is scored, or anything else
+		ironDensity takes (a material name if registry is given)
+	volumes: volume of each mesh element (or filter bin) cm3, flattened the way
+		calcHeating does. Mesh elements must be the first filter.
+	outPath: h5 file to write 'mean' and 'std_dev' datasets to, one entry per filter bin
+	chunkSize: number of filter bins per chunk
+	dtype: float type to reduce in and write
+	registry: getMaterial.MaterialRegistry to look material up in by name
+	"""
+	volumes = _flatVolumes(volumes)
+
+	nRows, nuclides = _tallyInfo(statepoint, tallyId)
+	FeDensity = ironDensity(material, nuclides, registry)
+
+	with _createOutput(outPath, nRows, dtype, 'DPA/FPY', statepoint, tallyId) as out:
+		for start, mean, stdDev in _iterTallyChunks(statepoint, tallyId, 'damage-energy', chunkSize):
+			stop = start + len(mean)
+			DPAmean, DPAstDev = meshDPA(
+				mean, stdDev, FeDensity, _volumesFor(volumes, nRows, start, stop), power, dtype)
+			out['mean'][start:stop] = DPAmean
+			out['std_dev'][start:stop] = DPAstDev
@@ -0,0 +1,257 @@
+"""
+Batch heating and DPA post-processing of many tallies from many statepoints.
+
+The manifest is a JSON list of jobs, each a dict with
+
+    name: group name for the job in the results file
+    kind: "heating" or "dpa"
+    statepoint: path to the openmc statepoint h5 file
+    tally_id: id of the tally to process
+    power: device power in W
+    volumes: optional for heating, path to a .npy array of volumes in tally
+        order (see tallierizer.streamHeating), or to the h5m mesh the tally
+        was scored on
+    nuclides: optional for heating, names of the nuclide bins to sum
+    materials: for dpa, path to a materials.xml
+    material: for dpa, name of the material the tally is scored in
+
+    python -m edgars_little_helpers.tallierizer_batch manifest.json results.h5 \
+        --workers 8
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import tempfile
+import time
+import h5py
+import numpy as np
+from . import tallierizer
+from .getMaterial import MaterialRegistry
+from .h5m_mesh import tet_volumes
+
+# volumes already opened by this worker process, keyed by path
+_volumes = {}
+
+
+def load_volumes(path):
+    """
+    Memory map a .npy volume array read only, once per process. Every job
+    and every worker reading the same file shares the same pages. An h5m
+    mesh can be given instead, its tet volumes are then computed once per
+    process in element order.
+
+    Arguments:
+        path (str): path to .npy or .h5m file
+
+    Returns:
+        volumes (np array)
+    """
+    path = os.path.abspath(path)
+    if path not in _volumes:
+        if path.endswith(".h5m"):
+            _volumes[path] = tet_volumes(path)
+        else:
+            _volumes[path] = np.load(path, mmap_mode="r")
+    return _volumes[path]
+
+
+def material_densities(jobs):
+    """
+    Parse each materials.xml named in the jobs once and return the atom
+    density dicts of the materials the jobs use.
+
+    Arguments:
+        jobs (list of dict): manifest entries
+
+    Returns:
+        densities (dict): (materials path, material name) -> atom densities,
+            or the exception raised finding them, e.g. for a material that
+            isn't in its materials.xml
+    """
+    densities = {}
+    parsed = {}
+    for job in jobs:
+        if job["kind"] != "dpa":
+            continue
+        key = (os.path.abspath(job["materials"]), job["material"])
+        if key in densities:
+            continue
+        try:
+            if key[0] not in parsed:
+                parsed[key[0]] = MaterialRegistry.from_xml(key[0])
+            if job["material"] not in parsed[key[0]]:
+                raise ValueError(
+                    f"no material {job['material']} in {key[0]}"
+                )
+            densities[key] = parsed[key[0]].atomDensities(job["material"])
+        except Exception as error:
+            densities[key] = error
+
+    return densities
+
+
+def run_job(job, densities, out_path, chunk_size, dtype):
+    """
+    Run a single manifest job, writing its results to out_path.
+
+    Returns:
+        seconds (float): wall time of the job
+    """
+    start = time.perf_counter()
+
+    if job["kind"] == "heating":
+        volumes = None
+        if job.get("volumes") is not None:
+            volumes = load_volumes(job["volumes"])
+        tallierizer.streamHeating(
+            job["statepoint"],
+            job["tally_id"],
+            job["power"],
+            out_path,
+            volumes,
+            chunkSize=chunk_size,
+            dtype=dtype,
+            nuclides=job.get("nuclides"),
+        )
+    elif job["kind"] == "dpa":
+        tallierizer.streamDPAIron(
+            job["statepoint"],
+            job["tally_id"],
+            job["power"],
+            densities,
+            load_volumes(job["volumes"]),
+            out_path,
+            chunkSize=chunk_size,
+            dtype=dtype,
+        )
+    else:
+        raise ValueError(f"unknown job kind {job['kind']}")
+
+    return time.perf_counter() - start
+
+
+def _job_group(results, job, error=None):
+    """
+    Create the results group of a job holding its parameters as attributes,
+    and the error if it failed.
+    """
+    group = results.create_group(job["name"])
+    for key, value in job.items():
+        if value is not None:
+            group.attrs[key] = value
+
+    if error is not None:
+        group.attrs["error"] = repr(error)
+        print(f"{job['name']}: failed, {error!r}")
+
+    return group
+
+
+def run_batch(
+    jobs, results_path, workers=1, chunk_size=1000000, dtype=np.float64
+):
+    """
+    Run every job across a process pool and gather the results into one HDF5
+    file, with a group per job holding mean and std_dev datasets and the
+    job's parameters and timing as attributes.
+
+    A failing job doesn't stop the others; its group records the error
+    instead of results.
+
+    Arguments:
+        jobs (list of dict): manifest entries, see module docstring
+        results_path (str): HDF5 file to write
+        workers (int): number of worker processes
+        chunk_size (int): filter bins read per chunk in each job
+        dtype (np dtype): float type of the results
+
+    Returns:
+        timings (dict): job name -> seconds, None for failed jobs
+    """
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("job names in the manifest must be unique")
+
+    densities = material_densities(jobs)
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            futures = {}
+            failed = []
+            for i, job in enumerate(jobs):
+                job_densities = None
+                if job["kind"] == "dpa":
+                    job_densities = densities[
+                        (os.path.abspath(job["materials"]), job["material"])
+                    ]
+                    if isinstance(job_densities, Exception):
+                        failed.append((job, job_densities))
+                        continue
+                out_path = os.path.join(scratch, f"{i}.h5")
+                future = executor.submit(
+                    run_job, job, job_densities, out_path, chunk_size, dtype
+                )
+                futures[future] = (job, out_path)
+
+            with h5py.File(results_path, "w") as results:
+                for job, error in failed:
+                    _job_group(results, job, error)
+                    timings[job["name"]] = None
+
+                for future in concurrent.futures.as_completed(futures):
+                    job, out_path = futures[future]
+                    try:
+                        seconds = future.result()
+                    except Exception as error:
+                        _job_group(results, job, error)
+                        timings[job["name"]] = None
+                        continue
+
+                    group = _job_group(results, job)
+
+                    with h5py.File(out_path, "r") as job_results:
+                        for key in job_results:
+                            job_results.copy(key, group)
+                        group.attrs["units"] = job_results.attrs["units"]
+                    group.attrs["seconds"] = seconds
+                    timings[job["name"]] = seconds
+                    print(f"{job['name']}: {seconds:.2f} s")
+                    os.remove(out_path)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("manifest", help="JSON list of jobs")
+    parser.add_argument("results", help="HDF5 file to write results to")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=1000000)
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="reduce and store results in single precision",
+    )
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+
+    run_batch(
+        jobs,
+        args.results,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        dtype=np.float32 if args.float32 else np.float64,
+    )
+
+
+if __name__ == "__main__":
+    main()
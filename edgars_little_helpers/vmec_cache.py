@@ -0,0 +1,155 @@
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+from .vmec_surface import VMECSurface
+
+# number of parsed equilibria and of fitted surfaces kept in each process
+max_cached = 4
+
+_COEFFICIENTS = ("xm", "xn", "rmnc", "zmns")
+
+_hashes = {}
+_equilibria = OrderedDict()
+_surfaces = OrderedDict()
+
+
+def file_hash(path):
+    """
+    Return the sha256 of a file's contents. The hash is remembered against
+    the file's size and modification time, so an unchanged file is only
+    read once per process.
+
+    Arguments:
+        path (str): file to hash
+
+    Returns:
+        digest (str): hex digest of the contents
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+
+    if key not in _hashes:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        _hashes[key] = sha.hexdigest()
+
+    return _hashes[key]
+
+
+def _remember(cache, key, value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_cached:
+        cache.popitem(last=False)
+
+
+def load_vmec(path):
+    """
+    Return read_vmec.VMECData for path, reusing an already parsed copy of the
+    same file contents if there is one in this process.
+
+    Arguments:
+        path (str): path to vmec wout file
+
+    Returns:
+        vmec (read_vmec object)
+    """
+    key = file_hash(path)
+    if key in _equilibria:
+        _equilibria.move_to_end(key)
+        return _equilibria[key]
+
+    import pystell.read_vmec as read_vmec
+
+    vmec = read_vmec.VMECData(path)
+    _remember(_equilibria, key, vmec)
+
+    return vmec
+
+
+def _surface_dir(cache_dir, key, wall_s, scale):
+    # repr of a plain float, a numpy scalar's repr names its type
+    return os.path.join(
+        cache_dir, f"{key}_s{repr(float(wall_s))}_x{repr(float(scale))}"
+    )
+
+
+def _load_pinned(directory, wall_s, scale):
+    """Memory map the saved coefficients of a surface read only"""
+    arrays = [
+        np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+        for name in _COEFFICIENTS
+    ]
+    return VMECSurface.from_coefficients(*arrays, wall_s, scale)
+
+
+def _save_pinned(directory, surface):
+    os.makedirs(directory, exist_ok=True)
+    for name in _COEFFICIENTS:
+        path = os.path.join(directory, name + ".npy")
+        # write then rename so concurrent readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, getattr(surface, name))
+        os.replace(temp_path, path)
+
+
+def load_surface(path, wall_s, scale=100, cache_dir=None):
+    """
+    Return the VMECSurface for wall_s of the equilibrium in path, fitting it
+    only if the same file contents haven't been seen before.
+
+    Surfaces are kept in this process keyed on the file's content hash and
+    wall_s. If cache_dir is given the coefficients are also written there
+    as .npy files and later loads memory map them read only, so other runs,
+    and every worker forked from a process that loaded them, share the same
+    pages instead of each holding a copy.
+
+    Arguments:
+        path (str): path to vmec wout file
+        wall_s (float): vmec parameter for the surface of interest
+        scale (float): factor applied to the vmec lengths, 100 for cm
+        cache_dir (str): optional directory for the memory mapped
+            coefficients
+
+    Returns:
+        surface (VMECSurface): with read only coefficient arrays
+    """
+    key = (file_hash(path), float(wall_s), float(scale))
+    if key in _surfaces:
+        _surfaces.move_to_end(key)
+        return _surfaces[key]
+
+    directory = None
+    surface = None
+    if cache_dir is not None:
+        directory = _surface_dir(cache_dir, *key)
+        if all(
+            os.path.exists(os.path.join(directory, name + ".npy"))
+            for name in _COEFFICIENTS
+        ):
+            surface = _load_pinned(directory, wall_s, scale)
+
+    if surface is None:
+        surface = VMECSurface(load_vmec(path), wall_s, scale)
+        if directory is not None:
+            _save_pinned(directory, surface)
+            surface = _load_pinned(directory, wall_s, scale)
+        else:
+            for name in _COEFFICIENTS:
+                getattr(surface, name).flags.writeable = False
+
+    _remember(_surfaces, key, surface)
+
+    return surface
+
+
+def clear():
+    """Forget every cached equilibrium, surface and file hash"""
+    _hashes.clear()
+    _equilibria.clear()
+    _surfaces.clear()
@@ -0,0 +1,321 @@
+import numpy as np
+from . import instrumentation
+
+
+def fit_surface_coefficients(vmec, wall_s, scale=100):
+    """
+    Recover the Fourier coefficients of the surface at wall_s from a vmec
+    object. The surface is sampled once on a uniform (theta, phi) grid fine
+    enough to resolve every mode in xm, xn and the coefficients are found by
+    least squares, so the result matches vmec2xyz however the equilibrium
+    interpolates between flux surfaces (including extrapolation past s=1).
+
+    Arguments:
+        vmec (read_vmec object): plasma equilibrium information
+        wall_s (float): vmec parameter for the surface of interest
+        scale (float): factor applied to the vmec lengths, 100 for cm
+
+    Returns:
+        rmnc (1D np array): cosine coefficients of R at wall_s
+        zmns (1D np array): sine coefficients of Z at wall_s
+    """
+    xm = np.asarray(vmec.xm, dtype=float)
+    xn = np.asarray(vmec.xn, dtype=float)
+
+    num_theta = 2 * int(np.max(np.abs(xm))) + 2
+    num_phi = 2 * int(np.max(np.abs(xn))) + 2
+
+    theta_grid = np.linspace(0, 2 * np.pi, num_theta, endpoint=False)
+    phi_grid = np.linspace(0, 2 * np.pi, num_phi, endpoint=False)
+    thetas, phis = np.meshgrid(theta_grid, phi_grid, indexing="ij")
+    thetas = thetas.ravel()
+    phis = phis.ravel()
+
+    r_samples = np.empty(len(thetas))
+    z_samples = np.empty(len(thetas))
+    with instrumentation.timer("vmec_surface.fit"):
+        for i, (theta, phi) in enumerate(zip(thetas, phis)):
+            x, y, z = vmec.vmec2xyz(wall_s, theta, phi)
+            r_samples[i] = x * np.cos(phi) + y * np.sin(phi)
+            z_samples[i] = z
+    instrumentation.count("vmec2xyz.calls", len(thetas))
+
+    angles = np.outer(thetas, xm) - np.outer(phis, xn)
+
+    rmnc = np.linalg.lstsq(np.cos(angles), r_samples, rcond=None)[0]
+    zmns = np.linalg.lstsq(np.sin(angles), z_samples, rcond=None)[0]
+
+    return rmnc * scale, zmns * scale
+
+
+class VMECSurface(object):
+    """
+    Vectorized Fourier series representation of the vmec surface at wall_s.
+
+    Evaluates any number of (theta, phi) points in a single numpy operation
+    rather than one scalar vmec2xyz call per point. Lengths are in cm to
+    match the rest of centroids_to_theta_phi.
+
+    Arguments:
+        vmec (read_vmec object): plasma equilibrium information
+        wall_s (float): vmec parameter for the surface of interest
+        scale (float): factor applied to the vmec lengths, 100 for cm
+    """
+
+    def __init__(self, vmec, wall_s, scale=100):
+        self.wall_s = wall_s
+        self.scale = scale
+        self.xm = np.asarray(vmec.xm, dtype=float)
+        self.xn = np.asarray(vmec.xn, dtype=float)
+        self.rmnc, self.zmns = fit_surface_coefficients(vmec, wall_s, scale)
+
+    @classmethod
+    def from_coefficients(cls, xm, xn, rmnc, zmns, wall_s, scale=100):
+        """
+        Build a surface directly from already scaled coefficients, e.g. ones
+        saved from a previous run, without needing the vmec file.
+
+        Arguments:
+            xm (1D np array): poloidal mode numbers
+            xn (1D np array): toroidal mode numbers
+            rmnc (1D np array): cosine coefficients of R at wall_s
+            zmns (1D np array): sine coefficients of Z at wall_s
+            wall_s (float): vmec parameter the coefficients belong to
+            scale (float): factor that was applied to the vmec lengths
+
+        Returns:
+            surface (VMECSurface)
+        """
+        surface = cls.__new__(cls)
+        surface.wall_s = wall_s
+        surface.scale = scale
+        surface.xm = np.asarray(xm, dtype=float)
+        surface.xn = np.asarray(xn, dtype=float)
+        surface.rmnc = np.asarray(rmnc, dtype=float)
+        surface.zmns = np.asarray(zmns, dtype=float)
+
+        return surface
+
+    # points evaluated at a time, bounds the (points X modes) temporaries
+    chunk_size = 20000
+
+    def rz(self, thetas, phis):
+        """
+        Return R and Z of the surface at matching arrays of theta and phi.
+
+        Arguments:
+            thetas (np array): poloidal angles in radians
+            phis (np array): toroidal angles in radians, broadcastable
+                against thetas
+
+        Returns:
+            r (np array): major radius at each point
+            z (np array): height at each point
+        """
+        r, z = self.rz_derivatives(thetas, phis, 0)
+
+        return r[0], z[0]
+
+    def xyz(self, thetas, phis):
+        """
+        Return cartesian points on the surface at matching arrays of theta
+        and phi.
+
+        Arguments:
+            thetas (np array): poloidal angles in radians
+            phis (np array): toroidal angles in radians, broadcastable
+                against thetas
+
+        Returns:
+            points (np array of x,y,z): shape of the broadcast angles + (3,)
+        """
+        thetas, phis = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(phis, dtype=float)
+        )
+        r, z = self.rz(thetas, phis)
+
+        return np.stack((r * np.cos(phis), r * np.sin(phis), z), axis=-1)
+
+    def points_and_normals(self, thetas, phis):
+        """
+        Return cartesian points on the surface and the unit normals there.
+
+        The normal is the one residual and solve_thetas offset along: in the
+        phi plane, perpendicular to the theta tangent, (dZ/dtheta,
+        -dR/dtheta) in (R, Z), which points out of the plasma.
+
+        Arguments:
+            thetas (np array): poloidal angles in radians
+            phis (np array): toroidal angles in radians, broadcastable
+                against thetas
+
+        Returns:
+            points (np array of x,y,z): shape of the broadcast angles + (3,)
+            normals (np array of x,y,z): unit normals, same shape
+        """
+        thetas, phis = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(phis, dtype=float)
+        )
+        r, z = self.rz_derivatives(thetas, phis, 1)
+        cos_phis = np.cos(phis)
+        sin_phis = np.sin(phis)
+
+        norms = np.hypot(r[1], z[1])
+        normal_r = z[1] / norms
+        normal_z = -r[1] / norms
+
+        points = np.stack((r[0] * cos_phis, r[0] * sin_phis, z[0]), axis=-1)
+        normals = np.stack(
+            (normal_r * cos_phis, normal_r * sin_phis, normal_z), axis=-1
+        )
+
+        return points, normals
+
+    def workspace(self, num_points, chunk_size=None):
+        """
+        Buffers for rz_derivatives to evaluate num_points points in, so
+        repeated evaluations, as in a root finder, don't allocate them
+        every time.
+
+        Arguments:
+            num_points (int): most points that will be evaluated at once
+            chunk_size (int): points per chunk, defaults to self.chunk_size
+
+        Returns:
+            work (tuple of np arrays): chunk X modes angle, cos and sin
+                buffers
+        """
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        shape = (max(1, min(chunk_size, num_points)), len(self.xm))
+        return np.empty(shape), np.empty(shape), np.empty(shape)
+
+    def _derivative_coefficients(self, order):
+        """
+        For each derivative k up to order, whether R and Z come from the
+        cosines or the sines and the coefficients to multiply them by, with
+        the signs of d^k/dtheta^k cos(m theta - n phi) = m^k cos(angle +
+        k pi/2) folded in.
+        """
+        cached = getattr(self, "_coefficients", [])
+        for k in range(len(cached), order + 1):
+            r_sign = -1.0 if k % 4 in (1, 2) else 1.0
+            z_sign = -1.0 if k % 4 in (2, 3) else 1.0
+            cached.append(
+                (
+                    k % 2 == 1,
+                    r_sign * self.rmnc * self.xm**k,
+                    z_sign * self.zmns * self.xm**k,
+                )
+            )
+        self._coefficients = cached
+        return cached[: order + 1]
+
+    def rz_derivatives(self, thetas, phis, order, out=None, work=None):
+        """
+        Return R, Z and their analytic derivatives with respect to theta up
+        to the given order, at matching arrays of theta and phi.
+
+        Arguments:
+            thetas (np array): poloidal angles in radians
+            phis (np array): toroidal angles in radians, broadcastable
+                against thetas
+            order (int): highest derivative to return
+            out (tuple of np arrays): optional (r, z) to write to, each
+                (order + 1) X number of points
+            work (tuple of np arrays): optional buffers from workspace(),
+                the points are evaluated as many at a time as they hold
+
+        Returns:
+            r (np array): (order + 1) X broadcast shape, r[k] is the kth
+                theta derivative of R
+            z (np array): the same for Z
+        """
+        thetas, phis = np.broadcast_arrays(
+            np.asarray(thetas, dtype=float), np.asarray(phis, dtype=float)
+        )
+        shape = thetas.shape
+        thetas = thetas.ravel()
+        phis = phis.ravel()
+        num_points = len(thetas)
+        instrumentation.count("vmec_surface.evaluations", num_points)
+
+        if out is None:
+            r = np.empty((order + 1, num_points))
+            z = np.empty((order + 1, num_points))
+        else:
+            r, z = out
+        if work is None:
+            work = self.workspace(num_points)
+        angles, cos_angles, sin_angles = work
+        chunk_size = len(angles)
+        coefficients = self._derivative_coefficients(order)
+
+        for start in range(0, num_points, chunk_size):
+            stop = min(start + chunk_size, num_points)
+            n = stop - start
+            # sin_angles holds the phases until the sines overwrite them
+            np.multiply.outer(phis[start:stop], self.xn, out=sin_angles[:n])
+            np.multiply.outer(thetas[start:stop], self.xm, out=angles[:n])
+            np.subtract(angles[:n], sin_angles[:n], out=angles[:n])
+            np.cos(angles[:n], out=cos_angles[:n])
+            np.sin(angles[:n], out=sin_angles[:n])
+
+            # even derivatives of R are cosines and of Z sines, odd the
+            # other way around
+            for k, (odd, r_coeffs, z_coeffs) in enumerate(coefficients):
+                r_angles = sin_angles[:n] if odd else cos_angles[:n]
+                z_angles = cos_angles[:n] if odd else sin_angles[:n]
+                np.matmul(r_angles, r_coeffs, out=r[k, start:stop])
+                np.matmul(z_angles, z_coeffs, out=z[k, start:stop])
+
+        if out is not None:
+            return r, z
+        return r.reshape((order + 1,) + shape), z.reshape((order + 1,) + shape)
+
+    def rz_grid(self, theta_grid, phis):
+        """
+        Return R and Z for every combination of theta_grid and phis. Each
+        is a dense matrix product, avoiding a (phis X thetas X modes)
+        intermediate array.
+
+        Arguments:
+            theta_grid (1D np array): poloidal angles in radians
+            phis (1D np array): toroidal angles in radians
+
+        Returns:
+            r (np array): len(phis) X len(theta_grid) major radii
+            z (np array): len(phis) X len(theta_grid) heights
+        """
+        m_theta = np.outer(self.xm, theta_grid)
+        n_phi = np.outer(phis, self.xn)
+
+        cos_m, sin_m = np.cos(m_theta), np.sin(m_theta)
+        cos_n, sin_n = np.cos(n_phi), np.sin(n_phi)
+
+        # cos(m theta - n phi) = cos(m theta)cos(n phi) + sin(m theta)sin(n phi)
+        # sin(m theta - n phi) = sin(m theta)cos(n phi) - cos(m theta)sin(n phi)
+        r = (cos_n * self.rmnc) @ cos_m + (sin_n * self.rmnc) @ sin_m
+        z = (cos_n * self.zmns) @ sin_m - (sin_n * self.zmns) @ cos_m
+
+        return r, z
+
+
+def as_surface(vmec, wall_s):
+    """
+    Return a VMECSurface for wall_s, reusing vmec if it already is one.
+
+    Arguments:
+        vmec (read_vmec object or VMECSurface): plasma equilibrium
+        wall_s (float): vmec parameter for the surface of interest
+
+    Returns:
+        surface (VMECSurface)
+    """
+    if isinstance(vmec, VMECSurface) and vmec.wall_s == wall_s:
+        return vmec
+    if isinstance(vmec, VMECSurface):
+        raise ValueError(
+            f"surface was built for wall_s={vmec.wall_s}, not {wall_s}"
+        )
+    return VMECSurface(vmec, wall_s)
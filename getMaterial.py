@@ -1,7 +1,8 @@
-import openmc
+"""
+Kept so scripts run from a checkout can still import this module by its
+old top level name, it now lives in the edgars_little_helpers package.
+"""
+import sys
+from edgars_little_helpers import getMaterial
 
-def getMaterial(materials, material):
-	for mat in materials:
-		if mat.name == material:
-			return mat
-			break
+sys.modules[__name__] = getMaterial
@@ -1,11 +1,8 @@
-import matplotlib.pyplot as pl
+"""
+Kept so scripts run from a checkout can still import this module by its
+old top level name, it now lives in the edgars_little_helpers package.
+"""
+import sys
+from edgars_little_helpers import plotxy
 
-def plotxy(x, y, xlabel, ylabel, title):#helper for plotting
-    fig = pl.figure(figsize=(5,4))
-    ax = fig.add_subplot(1,1,1)
-    ax.set_xlabel(xlabel)
-    ax.set_ylabel(ylabel)
-    pl.title(title)
-    ax.plot(x, y)
-      
-    fig.savefig(title + ".png")
\ No newline at end of file
+sys.modules[__name__] = plotxy
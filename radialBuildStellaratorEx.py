@@ -1,4 +1,4 @@
-from plotRadialBuildStellarator import plotRadialBuild
+from edgars_little_helpers.plotRadialBuildStellarator import plotRadialBuild
 
 import numpy as np
 